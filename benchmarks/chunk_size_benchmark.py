@@ -0,0 +1,33 @@
+"""CPU time per MB of `download_and_save_images` by chunk size."""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from image_downloader import PixabayImageDownloader  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+CHUNK_SIZES = [1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=20, help="downloads per chunk size")
+    parser.add_argument("--image-size", type=int, default=10 * 10**6)
+    args = parser.parse_args()
+
+    total_mb = args.n * args.image_size / 2**20
+    with StubServer(latency=0, image_size=args.image_size) as server, \
+            tempfile.TemporaryDirectory() as folder_path:
+        for chunk_size in CHUNK_SIZES:
+            downloader = PixabayImageDownloader(
+                folder_path + os.sep, api_key="stub", chunk_size=chunk_size
+            )
+            start = time.process_time()
+            for i in range(args.n):
+                downloader.download_and_save_images(f"{server.url}/images/{i}.jpg")
+            cpu_ms = (time.process_time() - start) * 1000
+            print(f"{chunk_size:>9} B: {cpu_ms / total_mb:7.3f} ms CPU/MB")
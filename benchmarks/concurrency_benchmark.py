@@ -0,0 +1,77 @@
+"""Throughput of fixed worker counts vs `--concurrency auto` on a shaped link."""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "file_downloader"))
+
+from concurrency import AdaptiveConcurrency  # noqa: E402
+from file_downloader import (PixabayDownloader,  # noqa: E402
+                             ThreadingDownloaderSaveTool, ThreadingFileSaver)
+from http_session import create_session  # noqa: E402
+from rate_limiter import RetryPolicy  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+FIXED_WORKERS = [2, 4, 8, 16, 32, 64]
+MIN_FRACTION = 0.8
+
+
+def run(api_url: str, n: int, workers=None, controller=None) -> float:
+    downloader = PixabayDownloader(
+        api_key="stub",
+        session=create_session(workers=64),
+        retry_policy=RetryPolicy(retries=0),
+    )
+    downloader.api_url = f"{api_url}/api/"
+    with tempfile.TemporaryDirectory() as folder_path:
+        tool = ThreadingDownloaderSaveTool(
+            downloader, ThreadingFileSaver(folder_path), workers, controller=controller
+        )
+        start = time.perf_counter()
+        tool.run(["benchmark"], n)
+        elapsed = time.perf_counter() - start
+        saved = sum(
+            os.path.getsize(os.path.join(folder_path, name))
+            for name in os.listdir(folder_path)
+        )
+    return saved / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=1500, help="number of images")
+    parser.add_argument("--bandwidth", type=float, default=20e6, help="bytes/s")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--image-size", type=int, default=256 * 1024)
+    parser.add_argument("--max-connections", type=int, default=40)
+    parser.add_argument(
+        "--min-fraction",
+        type=float,
+        default=MIN_FRACTION,
+        help="share of the best fixed throughput auto must reach",
+    )
+    args = parser.parse_args()
+
+    with StubServer(
+        latency=args.latency,
+        image_size=args.image_size,
+        total_hits=args.n,
+        bandwidth=args.bandwidth,
+        max_connections=args.max_connections,
+    ) as server:
+        results = {f"fixed {n}": run(server.url, args.n, n) for n in FIXED_WORKERS}
+        controller = AdaptiveConcurrency(interval=0.5)
+        results["auto"] = run(server.url, args.n, controller=controller)
+    print()
+    best = max(results.values())
+    for name, throughput in results.items():
+        print(
+            f"{name:>9}: {throughput / 1e6:7.2f} MB/s  "
+            f"({100 * throughput / best:5.1f}% of best)"
+        )
+    print(f"auto settled at {controller.limits()}")
+    if results["auto"] < args.min_fraction * best:
+        print(f"auto is below {100 * args.min_fraction:.0f}% of the best fixed setting")
+        sys.exit(1)
@@ -0,0 +1,44 @@
+"""Compare the threads and async download engines against a local stub server."""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "file_downloader"))
+
+from async_downloader import AsyncDownloaderSaveTool  # noqa: E402
+from file_downloader import (FileSaver, PixabayDownloader,  # noqa: E402
+                             ThreadingDownloaderSaveTool, ThreadingFileSaver)
+from stub_server import StubServer  # noqa: E402
+
+
+def build_tools(api_url: str, folder_path: str):
+    downloader = PixabayDownloader(api_key="stub")
+    downloader.api_url = f"{api_url}/api/"
+    return {
+        "threads": ThreadingDownloaderSaveTool(
+            downloader, ThreadingFileSaver(folder_path)
+        ),
+        "async": AsyncDownloaderSaveTool(downloader, FileSaver(folder_path)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=300, help="number of images")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per image")
+    parser.add_argument("--image-size", type=int, default=100 * 1024)
+    args = parser.parse_args()
+
+    with StubServer(args.latency, args.image_size, total_hits=args.n) as server:
+        results = {}
+        for engine in ("threads", "async"):
+            with tempfile.TemporaryDirectory() as folder_path:
+                tool = build_tools(server.url, folder_path + os.sep)[engine]
+                start = time.perf_counter()
+                tool.run(["benchmark"], args.n)
+                results[engine] = time.perf_counter() - start
+    print()
+    for engine, elapsed in results.items():
+        print(f"{engine:>8}: {elapsed:7.2f}s  {args.n / elapsed:8.1f} files/s")
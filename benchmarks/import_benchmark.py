@@ -0,0 +1,71 @@
+"""Cold-start import cost of the CLI entry points, measured with -X importtime."""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BUDGET_MS = 60.0
+RUNS = 5
+FORBIDDEN = {"requests", "aiohttp", "dependency_injector", "dotenv", "asyncio"}
+COMMANDS = {
+    "file_cli_tool --help": (os.path.join(ROOT, "file_downloader"), "file_cli_tool.py"),
+    "cli_tool_3 --help": (ROOT, "cli_tool_3.py"),
+}
+
+
+def import_times(cwd: str, args: List[str]) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every import of one cold start."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        # Nested imports are indented below the module that triggered them.
+        imports.append((module[1:].rstrip(), int(own), int(cumulative)))
+    return imports
+
+
+def total_ms(imports: List[Tuple[str, int, int]]) -> float:
+    return sum(own for _, own, _ in imports) / 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="ms")
+    parser.add_argument("--runs", type=int, default=RUNS, help="best of N runs")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules shown")
+    args = parser.parse_args()
+
+    baseline = min(
+        total_ms(import_times(ROOT, ["-c", "pass"])) for _ in range(args.runs)
+    )
+    over_budget = False
+    for name, (cwd, script) in COMMANDS.items():
+        runs = [import_times(cwd, [script, "--help"]) for _ in range(args.runs)]
+        imports = min(runs, key=total_ms)
+        cost = total_ms(imports) - baseline
+        forbidden = sorted({module.strip() for module, _, _ in imports} & FORBIDDEN)
+        failed = cost > args.budget or bool(forbidden)
+        over_budget |= failed
+        print(
+            f"{name}: {cost:.1f} ms over a bare interpreter "
+            f"(budget {args.budget:.0f} ms) {'FAIL' if failed else 'ok'}"
+        )
+        if forbidden:
+            print(f"  imports {', '.join(forbidden)} before parsing arguments")
+        top_level = [entry for entry in imports if not entry[0].startswith(" ")]
+        for module, _, cumulative in sorted(top_level, key=lambda entry: -entry[2])[
+            : args.top
+        ]:
+            print(f"  {cumulative / 1000:7.1f} ms  {module}")
+    sys.exit(1 if over_budget else 0)
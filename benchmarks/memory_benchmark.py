@@ -0,0 +1,69 @@
+"""Peak RSS of buffered vs streamed downloads of large images."""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "file_downloader"))
+
+from file_downloader import (PixabayDownloader,  # noqa: E402
+                             ThreadingDownloaderSaveTool, ThreadingFileSaver)
+from stub_server import StubServer  # noqa: E402
+
+WORKERS = 10
+
+
+def run_buffered(downloader: PixabayDownloader, folder_path: str, n: int) -> None:
+    """The previous behaviour: the whole body is read into `response.content`."""
+
+    def download_and_save(url: str) -> None:
+        content = downloader.session.get(url, stream=True).content
+        with open(os.path.join(folder_path, downloader._create_file_name(url)), "wb") as f:
+            f.write(content)
+
+    with ThreadPoolExecutor(WORKERS) as pool:
+        pool.map(download_and_save, downloader._iter_file_paths(["benchmark"], n))
+
+
+def run_streamed(downloader: PixabayDownloader, folder_path: str, n: int) -> None:
+    tool = ThreadingDownloaderSaveTool(
+        downloader, ThreadingFileSaver(folder_path), workers=WORKERS
+    )
+    tool.run(["benchmark"], n)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=40, help="number of images")
+    parser.add_argument("--image-size", type=int, default=20 * 10**6)
+    parser.add_argument("--mode", choices=["buffered", "streamed"])
+    parser.add_argument("--api-url")
+    args = parser.parse_args()
+
+    if args.mode:
+        downloader = PixabayDownloader(api_key="stub")
+        downloader.api_url = f"{args.api_url}/api/"
+        with tempfile.TemporaryDirectory() as folder_path:
+            {"buffered": run_buffered, "streamed": run_streamed}[args.mode](
+                downloader, folder_path, args.n
+            )
+        print(f"\n{peak_rss_mb():.1f}")
+        sys.exit()
+
+    with StubServer(latency=0, image_size=args.image_size, total_hits=args.n) as server:
+        for mode in ("buffered", "streamed"):
+            output = subprocess.run(
+                [sys.executable, __file__, "-n", str(args.n), "--mode", mode,
+                 "--api-url", server.url],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            print(f"{mode:>8}: peak RSS {output.split()[-1]} MB")
@@ -0,0 +1,59 @@
+"""Run the download tools against a stub server that throttles and fails."""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "file_downloader"))
+
+from async_downloader import AsyncDownloaderSaveTool  # noqa: E402
+from file_downloader import (FileSaver, PixabayDownloader,  # noqa: E402
+                             ThreadingDownloaderSaveTool, ThreadingFileSaver)
+from rate_limiter import RateLimiter, RetryPolicy  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+
+def build_tool(engine: str, api_url: str, folder_path: str, retries: int):
+    rate_limiter, retry_policy = RateLimiter(), RetryPolicy(retries)
+    downloader = PixabayDownloader(
+        api_key="stub", rate_limiter=rate_limiter, retry_policy=retry_policy
+    )
+    downloader.api_url = f"{api_url}/api/"
+    if engine == "threads":
+        return ThreadingDownloaderSaveTool(downloader, ThreadingFileSaver(folder_path))
+    return AsyncDownloaderSaveTool(
+        downloader,
+        FileSaver(folder_path),
+        rate_limiter=rate_limiter,
+        retry_policy=retry_policy,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=200, help="number of images")
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--rate-limit", type=int, default=50, help="requests/s")
+    parser.add_argument("--retries", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubServer(
+        latency=0.01,
+        image_size=10 * 1024,
+        total_hits=args.n,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+    ) as server:
+        for engine in ("threads", "async"):
+            with tempfile.TemporaryDirectory() as folder_path:
+                tool = build_tool(engine, server.url, folder_path, args.retries)
+                start = time.perf_counter()
+                tool.run(["benchmark"], args.n)
+                elapsed = time.perf_counter() - start
+                saved = len(os.listdir(folder_path))
+                policy = tool.file_downloader.retry_policy
+                print(
+                    f"\n{engine:>8}: {saved}/{args.n} saved in {elapsed:.2f}s. "
+                    f"{policy.summary()}"
+                )
@@ -0,0 +1,169 @@
+"""Local HTTP server that imitates the Pixabay/Pexels search APIs and a CDN."""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PIECE_SIZE = 64 * 1024
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, a reused
+    # connection waits for the client's delayed ACK between them.
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if self.server.throttled():
+            self.send_error_body(429, {"Retry-After": "1"})
+        elif random.random() < self.server.error_rate:
+            self.send_error_body(random.choice([500, 502, 503]))
+        elif url.path.startswith("/api"):
+            self.send_search_page(parse_qs(url.query))
+        elif url.path.startswith("/v1/search"):
+            self.send_search_page(parse_qs(url.query), pexels=True)
+        elif url.path.startswith("/images/"):
+            self.send_image()
+        else:
+            self.send_error(404)
+
+    def send_search_page(self, params, pexels: bool = False) -> None:
+        page = int(params.get("page", ["1"])[0])
+        per_page = int(params.get("per_page", ["20"])[0])
+        start = (page - 1) * per_page
+        stop = min(start + per_page, self.server.total_hits)
+        base_url = f"http://{self.server.server_address[0]}:{self.server.server_port}"
+        if pexels:
+            page_data = {
+                "total_results": self.server.total_hits,
+                "photos": [
+                    {"id": i, "src": {"original": f"{base_url}/images/{i}.jpg"}}
+                    for i in range(start, stop)
+                ],
+            }
+        else:
+            page_data = {
+                "totalHits": self.server.total_hits,
+                "hits": [
+                    {"id": i, "webformatURL": f"{base_url}/images/{i}.jpg"}
+                    for i in range(start, stop)
+                ],
+            }
+        self.send_body(json.dumps(page_data).encode(), "application/json")
+
+    def send_image(self) -> None:
+        if not self.server.enter():
+            self.send_error_body(503)
+            return
+        try:
+            time.sleep(self.server.latency)
+            if not self.server.bandwidth:
+                self.send_body(self.server.image_body, "image/jpeg")
+                return
+            body = memoryview(self.server.image_body)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            for start in range(0, len(body), PIECE_SIZE):
+                piece = body[start:start + PIECE_SIZE]
+                self.server.shape(len(piece))
+                self.wfile.write(piece)
+        finally:
+            self.server.leave()
+
+    def send_error_body(self, status: int, headers=None) -> None:
+        self.send_body(b"error", "text/plain", status, headers)
+
+    def send_body(self, body: bytes, content_type: str, status=200, headers=None) -> None:
+        self.send_response(status)
+        for name, value in {**self.server.rate_limit_headers(), **(headers or {})}.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        latency=0.05,
+        image_size=200 * 1024,
+        total_hits=500,
+        error_rate=0.0,
+        rate_limit=None,
+        bandwidth=None,
+        max_connections=None,
+    ):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.image_body = b"\xff" * image_size
+        self.total_hits = total_hits
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.bandwidth = bandwidth
+        self.max_connections = max_connections
+        self.connections = 0
+        self.link_free_at = time.monotonic()
+        self.window = int(time.time())
+        self.window_requests = 0
+        self.lock = threading.Lock()
+
+    def enter(self) -> bool:
+        with self.lock:
+            if self.max_connections and self.connections >= self.max_connections:
+                return False
+            self.connections += 1
+            return True
+
+    def leave(self) -> None:
+        with self.lock:
+            self.connections -= 1
+
+    def shape(self, size: int) -> None:
+        """Reserve the next `size` bytes of link time and wait for it."""
+        with self.lock:
+            now = time.monotonic()
+            self.link_free_at = max(self.link_free_at, now) + size / self.bandwidth
+            wait = self.link_free_at - now
+        time.sleep(wait)
+
+    def throttled(self) -> bool:
+        if not self.rate_limit:
+            return False
+        with self.lock:
+            now = int(time.time())
+            if now != self.window:
+                self.window, self.window_requests = now, 0
+            self.window_requests += 1
+            return self.window_requests > self.rate_limit
+
+    def rate_limit_headers(self):
+        if not self.rate_limit:
+            return {}
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(self.rate_limit - self.window_requests, 0)),
+            "X-RateLimit-Reset": "1",
+        }
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,251 @@
+"""Run every download path against the local stub server and save the numbers."""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from stub_server import StubServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TOP_LEVEL = ["normal", "threads", "progress_bar_2"]
+FILE_DOWNLOADER = ["pipeline", "async"]
+SCENARIOS = TOP_LEVEL + FILE_DOWNLOADER
+API_PATHS = {"pixabay": "/api/", "pexels": "/v1/search"}
+
+
+def percentile(values: List[float], percent: int) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def file_latencies(spans: List[Dict[str, Any]]) -> List[float]:
+    """Seconds from sending each request to writing its last byte."""
+    sent = {span["url"]: span["start"] for span in spans if span["name"] == "ttfb"}
+    return [
+        span["start"] + span["duration"] - sent[span["url"]]
+        for span in spans
+        if span["name"] == "transfer" and span["url"] in sent
+    ]
+
+
+def build_top_level(source: str, api_url: str, folder_path: str, tracer):
+    from image_downloader import PexelsImageDownloader, PixabayImageDownloader
+
+    downloader_class = {
+        "pixabay": PixabayImageDownloader,
+        "pexels": PexelsImageDownloader,
+    }[source]
+    downloader = downloader_class(folder_path, api_key="stub", tracer=tracer)
+    downloader.api_url = api_url
+    return downloader
+
+
+def build_file_downloader(source: str, api_url: str, tracer):
+    from file_downloader import PexelsDownloader, PixabayDownloader
+
+    downloader_class = {"pixabay": PixabayDownloader, "pexels": PexelsDownloader}[
+        source
+    ]
+    downloader = downloader_class(api_key="stub", tracer=tracer)
+    downloader.api_url = api_url
+    return downloader
+
+
+def run_scenario(scenario: str, source: str, api_url: str, n: int) -> Dict[str, Any]:
+    """Child side: run one scenario in this process and measure it."""
+    # The top-level modules import `file_downloader.tracing` as a package,
+    # which the `file_downloader.py` module would shadow if it were on the path.
+    if scenario in TOP_LEVEL:
+        sys.path.insert(0, ROOT)
+        from file_downloader.tracing import MemorySink, Tracer
+    else:
+        sys.path.insert(0, os.path.join(ROOT, "file_downloader"))
+        from tracing import MemorySink, Tracer
+
+    sink = MemorySink()
+    tracer = Tracer(sink)
+    query = ["benchmark"]
+    with tempfile.TemporaryDirectory() as folder_path:
+        folder_path += os.sep
+        # Every scenario is timed from the first search request, since the
+        # pipeline and async tools search and download in one call.
+        if scenario in TOP_LEVEL:
+            downloader = build_top_level(source, api_url, folder_path, tracer)
+            run = {
+                "normal": downloader.download_and_save_images_normal,
+                "threads": downloader.download_and_save_images_with_threads,
+                "progress_bar_2": (
+                    downloader.download_and_save_images_with_progress_bar_2
+                ),
+            }[scenario]
+            start = time.perf_counter()
+            run(list(downloader.iter_image_urls(query, n)), "benchmark")
+        else:
+            from async_downloader import AsyncDownloaderSaveTool
+            from file_downloader import (FileSaver, ThreadingDownloaderSaveTool,
+                                         ThreadingFileSaver)
+
+            downloader = build_file_downloader(source, api_url, tracer)
+            if scenario == "pipeline":
+                tool = ThreadingDownloaderSaveTool(
+                    downloader,
+                    ThreadingFileSaver(folder_path, tracer=tracer),
+                    show_progress=False,
+                    tracer=tracer,
+                )
+            else:
+                tool = AsyncDownloaderSaveTool(
+                    downloader,
+                    FileSaver(folder_path, tracer=tracer),
+                    show_progress=False,
+                    tracer=tracer,
+                )
+            start = time.perf_counter()
+            tool.run(query, n)
+        elapsed = time.perf_counter() - start
+        sizes = [
+            os.path.getsize(os.path.join(folder_path, name))
+            for name in os.listdir(folder_path)
+        ]
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    latencies = file_latencies(sink.spans)
+    return {
+        "elapsed": elapsed,
+        "files": len(sizes),
+        "bytes": sum(sizes),
+        "files_per_second": len(sizes) / elapsed,
+        "bytes_per_second": sum(sizes) / elapsed,
+        "latency": {
+            f"p{percent}": percentile(latencies, percent) for percent in (50, 95, 99)
+        },
+        # ru_maxrss is in KiB on Linux and in bytes on macOS.
+        "peak_rss_kb": usage.ru_maxrss // (1024 if sys.platform == "darwin" else 1),
+        "cpu_user": usage.ru_utime,
+        "cpu_system": usage.ru_stime,
+    }
+
+
+def run_in_child(scenario: str, args: argparse.Namespace, api_url: str) -> Dict:
+    with tempfile.NamedTemporaryFile(suffix=".json") as result:
+        subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--child",
+                scenario,
+                "--source",
+                args.source,
+                "-n",
+                str(args.n),
+                "--api-url",
+                api_url,
+                "-o",
+                result.name,
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        with open(result.name) as f:
+            return json.load(f)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print each metric's change against `baseline`; lower is better for time."""
+    if baseline.get("params") != results["params"]:
+        print("warning: baseline was run with different parameters")
+    for scenario, metrics in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(scenario)
+        if not old:
+            continue
+        changes = []
+        for name in ("files_per_second", "peak_rss_kb", "cpu_user"):
+            if old.get(name):
+                changes.append(f"{name} {100 * (metrics[name] / old[name] - 1):+.1f}%")
+        old_p95, p95 = old["latency"]["p95"], metrics["latency"]["p95"]
+        if old_p95 and p95:
+            changes.append(f"p95 {100 * (p95 / old_p95 - 1):+.1f}%")
+        print(f"{scenario:>15}: {', '.join(changes)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("-n", type=int, default=200, help="number of images")
+    parser.add_argument("--source", choices=list(API_PATHS), default="pixabay")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per image")
+    parser.add_argument("--image-size", type=int, default=200 * 1024)
+    parser.add_argument("--bandwidth", type=int, help="bytes/s shared by all images")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"comma separated subset of {','.join(SCENARIOS)}",
+    )
+    parser.add_argument("-o", "--output", help="write the results here as JSON")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--api-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_scenario(args.child, args.source, args.api_url, args.n)
+        with open(args.output, "w") as f:
+            json.dump(result, f)
+        sys.exit()
+
+    params = {
+        key: getattr(args, key)
+        for key in ("n", "source", "latency", "image_size", "bandwidth", "error_rate")
+    }
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "scenarios": {},
+    }
+    with StubServer(
+        args.latency,
+        args.image_size,
+        total_hits=args.n,
+        error_rate=args.error_rate,
+        bandwidth=args.bandwidth,
+    ) as server:
+        for scenario in args.scenarios.split(","):
+            metrics = run_in_child(scenario, args, server.url + API_PATHS[args.source])
+            results["scenarios"][scenario] = metrics
+            p95 = metrics["latency"]["p95"]
+            print(
+                f"{scenario:>15}: {metrics['elapsed']:7.2f}s "
+                f"{metrics['files_per_second']:8.1f} files/s  "
+                f"p95 {p95 or 0:.3f}s  rss {metrics['peak_rss_kb'] / 1024:.0f} MiB  "
+                f"cpu {metrics['cpu_user'] + metrics['cpu_system']:.2f}s"
+            )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
@@ -9,17 +9,21 @@
 # --source  - a source for uploading images(possible choices: pexels, pixabay)
 #  python3 cli_tool_3.py -q ferrari -n 10 --source pixabay  --save-to ~/work/sergei/mentoring/cli_tool/images/
 
+# This entry point drives the top-level image_downloader.py and stays separate
+# from file_downloader/file_cli_tool.py: that tool imports its modules flat from
+# file_downloader/, where file_downloader.py would shadow the package imported
+# below. New options go to file_cli_tool.py.
 import argparse
 import os
 
-from dotenv import load_dotenv
+from file_downloader.tracing import JsonlSink, Tracer, profile
 
-from image_downloader import PexelsImageDownloader, PixabayImageDownloader
-from utils import progress_bar
-
-load_dotenv()
-
-IMAGE_DOWNLOADERS = {"pixabay": PixabayImageDownloader, "pexels": PexelsImageDownloader}
+# Class names only: image_downloader pulls in requests, so it is imported
+# once the arguments are known to be valid.
+IMAGE_DOWNLOADERS = {
+    "pixabay": "PixabayImageDownloader",
+    "pexels": "PexelsImageDownloader",
+}
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Download images from pixabay.com")
@@ -30,28 +34,47 @@ if __name__ == "__main__":
     parser.add_argument(
         "--save-to", type=str, required=True, help="folder for saving images"
     )
-    parser.add_argument("--source", choices=["pixabay", "pexels"], required=True)
+    parser.add_argument("--source", choices=list(IMAGE_DOWNLOADERS), required=True)
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="bytes read from the socket per write (default 256 KiB)",
+    )
+    parser.add_argument(
+        "--metrics-json", help="write the run's counters and throughput samples here"
+    )
+    parser.add_argument("--trace", help="append timing spans here as JSON lines")
+    parser.add_argument("--profile", help="write a cProfile dump of the run here")
     args = parser.parse_args()
+
+    import image_downloader as downloaders
+    from dotenv import load_dotenv
+
+    from file_downloader.metrics import Metrics
+
+    load_dotenv()
+    tracer = Tracer(JsonlSink(args.trace) if args.trace else None)
+    metrics = Metrics()
     api_key = os.getenv(f"API_KEY_{args.source.upper()}")
     api_url = os.getenv(f"API_URL_{args.source.upper()}")
-    image_downloader = IMAGE_DOWNLOADERS[args.source](
-        folder_path=args.save_to, api_key=api_key
-    )
-    image_data = image_downloader.get_image_data(query=args.q)
-    image_urls = (
-        image_downloader.get_image_urls(image_data, args.n) if image_data else None
+    image_downloader = getattr(downloaders, IMAGE_DOWNLOADERS[args.source])(
+        folder_path=args.save_to,
+        api_key=api_key,
+        chunk_size=args.chunk_size or downloaders.BUFFER_SIZE,
+        tracer=tracer,
+        metrics=metrics,
     )
-    if image_urls:
-        name_prefix = f"{args.source}_" + "_".join(args.q)
+    image_urls = image_downloader.iter_image_urls(args.q, args.n)
+    name_prefix = f"{args.source}_" + "_".join(args.q)
 
-        # image_downloader.download_and_save_images_with_threads(image_urls, name_prefix)
-        # image_downloader.download_and_save_images_normal(image_urls, name_prefix)
-        # image_downloader.download_and_save_images_with_progress_bar(image_urls, name_prefix)
+    # image_downloader.download_and_save_images_with_threads(image_urls, name_prefix)
+    # image_downloader.download_and_save_images_normal(image_urls, name_prefix)
+    # image_downloader.download_and_save_images_with_progress_bar(image_urls, name_prefix)
+    with profile(args.profile):
         image_downloader.download_and_save_images_with_progress_bar_2(
-            image_urls, name_prefix
+            image_urls, name_prefix, total=args.n
         )
-        # for i in range(1000, 3000):
-        #     import time; time.sleep(0.001)
-        #     progress_bar(i, 3000)
-    print()
+    tracer.close()
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
     print("Done")
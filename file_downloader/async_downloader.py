@@ -0,0 +1,229 @@
+import asyncio
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Optional
+
+import aiohttp
+
+from concurrency import AdaptiveConcurrency, TransferSlot
+from dedup_store import DedupStore, DuplicateFile
+from file_downloader import CHUNK_SIZE, BaseFileDownloader, BaseFileSaver
+from manifest import JobManifest
+from metadata_index import MetadataIndex
+from metrics import Metrics, show_progress
+from rate_limiter import RateLimiter, RetryPolicy
+from tracing import NULL_TRACER, Tracer
+
+logger = logging.getLogger(__name__)
+DEFAULT_CONCURRENCY = 200
+WRITER_THREADS = 4
+
+
+class AsyncDownloaderSaveTool:
+    """Event-loop counterpart of `ThreadingDownloaderSaveTool`."""
+
+    def __init__(
+        self,
+        file_downloader: BaseFileDownloader,
+        file_saver: BaseFileSaver,
+        concurrency: Optional[int] = None,
+        dedup_store: Optional[DedupStore] = None,
+        manifest: Optional[JobManifest] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        controller: Optional[AdaptiveConcurrency] = None,
+        metrics: Optional[Metrics] = None,
+        show_progress: bool = True,
+        tracer: Optional[Tracer] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+    ):
+        self.file_downloader = file_downloader
+        self.file_saver = file_saver
+        self.controller = controller
+        self.concurrency = concurrency or (
+            controller.maximum if controller else DEFAULT_CONCURRENCY
+        )
+        self.dedup_store = dedup_store
+        self.manifest = manifest
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = metrics or Metrics()
+        self.show_progress = show_progress
+        self.tracer = tracer or NULL_TRACER
+        self.metadata_index = metadata_index
+
+    def run(self, query: List[str], number_of_files: int) -> None:
+        self.metrics.total_files += number_of_files
+        files = self.file_downloader._iter_files(query, number_of_files)
+        with show_progress(self.metrics, self.show_progress):
+            asyncio.run(self.download_files(files))
+
+    async def download_files(self, files: Iterator[Dict[str, Any]]) -> None:
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        tasks = set()
+        with ThreadPoolExecutor(WRITER_THREADS) as writers:
+            async with aiohttp.ClientSession(connector=connector) as session:
+                while True:
+                    file = await loop.run_in_executor(None, next, files, None)
+                    if file is None:
+                        break
+                    if self.dedup_store and await loop.run_in_executor(
+                        writers, self.dedup_store.contains, file
+                    ):
+                        logger.info(
+                            f"Skipping {file['url']}: "
+                            "already downloaded with these settings."
+                        )
+                        if self.metadata_index:
+                            await loop.run_in_executor(
+                                writers, self.metadata_index.add_query, file
+                            )
+                        self.metrics.add_skipped()
+                        continue
+                    await semaphore.acquire()
+                    task = loop.create_task(
+                        self.download_file(session, writers, file)
+                    )
+                    task.add_done_callback(lambda _: semaphore.release())
+                    task.add_done_callback(tasks.discard)
+                    tasks.add(task)
+                await asyncio.gather(*tasks)
+        logger.info("Done.")
+
+    async def download_file(
+        self,
+        session: aiohttp.ClientSession,
+        writers: ThreadPoolExecutor,
+        file: Dict[str, Any],
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        url = file["url"]
+        headers, entry, offset = {}, None, 0
+        if self.manifest:
+            headers, entry, offset = await loop.run_in_executor(
+                writers, self.manifest.build_headers, url, file.get("save_to")
+            )
+        slot = await self.controller.acquire_async(url) if self.controller else None
+        started = time.monotonic()
+        error = False
+        saved = False
+        try:
+            for attempt in itertools.count():
+                if self.rate_limiter:
+                    await asyncio.sleep(self.rate_limiter.reserve(url))
+                try:
+                    sent = time.perf_counter()
+                    async with session.get(url, headers=headers) as response:
+                        self.tracer.record(
+                            "ttfb",
+                            sent,
+                            time.perf_counter() - sent,
+                            url=url,
+                            status=response.status,
+                        )
+                        if self.rate_limiter:
+                            self.rate_limiter.update(
+                                url, response.status, response.headers
+                            )
+                        if not (
+                            self.retry_policy.should_retry(response.status)
+                            and attempt < self.retry_policy.retries
+                        ):
+                            saved = await self.save_response(
+                                response, writers, file, entry, offset, slot
+                            )
+                            break
+                except aiohttp.ClientConnectionError:
+                    if attempt >= self.retry_policy.retries:
+                        raise
+                self.retry_policy.count("retry")
+                await asyncio.sleep(self.retry_policy.backoff(attempt))
+        except DuplicateFile as duplicate:
+            logger.info(f"{duplicate}.")
+            self.metrics.add_skipped()
+        except Exception as err:
+            error = True
+            self.retry_policy.count("drop")
+            self.metrics.add_error()
+            logger.error(f"Error in time of downloading file: {err}.")
+        else:
+            logger.info("File downloads successfuly.")
+            if saved:
+                self.metrics.add_file(time.monotonic() - started)
+            else:
+                self.metrics.add_skipped()
+        finally:
+            if slot:
+                slot.release(error)
+
+    async def save_response(
+        self,
+        response: aiohttp.ClientResponse,
+        writers: ThreadPoolExecutor,
+        file: Dict[str, Any],
+        entry: Optional[Dict[str, Any]],
+        offset: int,
+        slot: Optional[TransferSlot] = None,
+    ) -> bool:
+        """Stream the body to disk; False if the file was not modified."""
+        if response.status == 304:
+            return False
+        loop = asyncio.get_running_loop()
+        complete = response.status == 416 and offset
+        if not complete:
+            response.raise_for_status()
+            offset = offset if response.status == 206 else 0
+        file_name = (
+            entry["file_name"]
+            if entry
+            else self.file_downloader._create_file_name(
+                str(response.url), file["source"]
+            )
+        )
+        if self.manifest and not complete:
+            await loop.run_in_executor(
+                writers,
+                self.manifest.record,
+                file["url"],
+                file_name,
+                response.headers,
+                offset,
+            )
+        file_info = {**file, "resume_offset": offset, "resumable": bool(self.manifest)}
+        async with self._open_file(writers, file_name, file_info) as f:
+            with self.tracer.span("transfer", url=file["url"], bytes=0) as span:
+                if not complete:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        await loop.run_in_executor(writers, f.write, chunk)
+                        self.metrics.add_bytes(len(chunk))
+                        span["bytes"] += len(chunk)
+                        if slot:
+                            slot.bytes += len(chunk)
+        if self.manifest:
+            await loop.run_in_executor(
+                writers, self.manifest.mark_complete, file["url"]
+            )
+        return True
+
+    @asynccontextmanager
+    async def _open_file(
+        self, writers: ThreadPoolExecutor, file_name: str, file_info: Dict[str, Any]
+    ) -> AsyncIterator[BinaryIO]:
+        """`file_saver.open_file` with its enter and exit run on a writer thread."""
+        loop = asyncio.get_running_loop()
+        context = self.file_saver.open_file(file_name, file_info)
+        f = await loop.run_in_executor(writers, context.__enter__)
+        try:
+            yield f
+        except BaseException as err:
+            if not await loop.run_in_executor(
+                writers, context.__exit__, type(err), err, err.__traceback__
+            ):
+                raise
+        else:
+            await loop.run_in_executor(writers, context.__exit__, None, None, None)
@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from metrics import show_progress
+from options import parse_sources
+
+if TYPE_CHECKING:
+    from file_downloader import FileSaver, ThreadingDownloaderSaveTool
+    from multi_source import MultiSourceDownloader
+
+logger = logging.getLogger(__name__)
+DEFAULT_ACTIVE_JOBS = 8
+
+
+@dataclass
+class Job:
+    query: List[str]
+    number_of_files: int
+    sources: List[str]
+    save_to: str
+
+
+def load_jobs(
+    path: str,
+    number_of_files: int = 1,
+    sources: Optional[List[str]] = None,
+    save_to: Optional[str] = None,
+) -> List[Job]:
+    """Read jobs from a JSONL file or a tab separated text file."""
+    jobs = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                fields = json.loads(line)
+            else:
+                fields = dict(
+                    zip(["query", "n", "source", "save_to"], line.split("\t"))
+                )
+            query = fields["query"]
+            job = Job(
+                query=query.split() if isinstance(query, str) else list(query),
+                number_of_files=int(fields.get("n") or number_of_files),
+                sources=(
+                    parse_sources(fields["source"])
+                    if fields.get("source")
+                    else sources
+                ),
+                save_to=fields.get("save_to") or save_to,
+            )
+            if not job.sources or not job.save_to:
+                raise ValueError(f"{path}:{line_number}: source and save_to are required")
+            jobs.append(job)
+    return jobs
+
+
+class BatchRunner:
+    """Runs many jobs in one process through one shared download pool."""
+
+    def __init__(self, container, active_jobs: int = DEFAULT_ACTIVE_JOBS):
+        self.container = container
+        self.active_jobs = active_jobs
+        self.savers: Dict[str, "FileSaver"] = {}
+
+    def run(
+        self, jobs: List[Job], tool: Optional["ThreadingDownloaderSaveTool"] = None
+    ) -> None:
+        """Run `jobs`; `tool` replaces the container's, e.g. for its own metrics."""
+        tool = tool or self.container.threading_download_save_tool()
+        tool.metrics.total_files += sum(job.number_of_files for job in jobs)
+        pipeline = tool.build_pipeline(lambda file: self._saver(file["save_to"]))
+        with show_progress(tool.metrics, tool.show_progress):
+            pipeline.run(file for _, file in self._interleave(tool, jobs))
+        logger.info(f"Done. Queue depth peaks: {pipeline.peaks}.")
+
+    def _interleave(
+        self, tool: "ThreadingDownloaderSaveTool", jobs: List[Job]
+    ) -> Iterator[Tuple[Job, Dict[str, Any]]]:
+        pending = iter(jobs)
+        active: List[Tuple[Job, Iterator[Dict[str, Any]]]] = []
+        while True:
+            while len(active) < self.active_jobs:
+                job = next(pending, None)
+                if job is None:
+                    break
+                active.append((job, self._iter_job_files(tool, job)))
+            if not active:
+                return
+            for job, files in list(active):
+                file = next(files, None)
+                if file is None:
+                    active.remove((job, files))
+                else:
+                    yield job, file
+
+    def _iter_job_files(
+        self, tool: "ThreadingDownloaderSaveTool", job: Job
+    ) -> Iterator[Dict[str, Any]]:
+        downloader: "MultiSourceDownloader" = self.container.downloader(
+            sources=job.sources
+        )
+        files = downloader._iter_files(job.query, job.number_of_files)
+        for file in tool._skip_downloaded(files):
+            yield {**file, "save_to": job.save_to}
+
+    def _saver(self, save_to: str) -> "FileSaver":
+        if save_to not in self.savers:
+            os.makedirs(save_to, exist_ok=True)
+            self.savers[save_to] = self.container.threading_saver(folder_path=save_to)
+        return self.savers[save_to]
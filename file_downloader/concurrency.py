@@ -0,0 +1,168 @@
+import time
+from threading import Condition
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Union
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import asyncio
+
+DEFAULT_INITIAL = 4
+DEFAULT_MINIMUM = 1
+DEFAULT_MAXIMUM = 64
+DEFAULT_INTERVAL = 1.0
+DECREASE_FACTOR = 0.5
+INCREASE_FACTOR = 2.0
+TOLERANCE = 0.05
+
+
+class HostState:
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.in_flight = 0
+        self.direction = 1
+        self.slow_start = True
+        self.saturated = False
+        self.window_start = time.monotonic()
+        self.bytes = 0
+        self.errors = 0
+        self.throughput = 0.0
+
+
+class TransferSlot:
+    """One in-flight download; counts its bytes and gives the slot back."""
+
+    def __init__(self, controller: "AdaptiveConcurrency", host: str):
+        self.controller = controller
+        self.host = host
+        self.bytes = 0
+        self.released = False
+
+    def count(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.bytes += len(chunk)
+            yield chunk
+
+    def release(self, error: bool = False) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self.host, self.bytes, error)
+
+
+class AdaptiveConcurrency:
+    """Per-host limit on in-flight downloads tuned from measured throughput."""
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_INITIAL,
+        minimum: int = DEFAULT_MINIMUM,
+        maximum: int = DEFAULT_MAXIMUM,
+        interval: float = DEFAULT_INTERVAL,
+    ):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.interval = interval
+        self.hosts: Dict[str, HostState] = {}
+        self.condition = Condition()
+        self.waiters: List["asyncio.Future"] = []
+
+    def _state(self, host: str) -> HostState:
+        if host not in self.hosts:
+            self.hosts[host] = HostState(self.initial)
+        return self.hosts[host]
+
+    def try_acquire(self, url: str) -> Optional[TransferSlot]:
+        host = urlsplit(url).netloc
+        with self.condition:
+            state = self._state(host)
+            if state.in_flight >= int(state.limit):
+                state.saturated = True
+                return None
+            state.in_flight += 1
+            if state.in_flight == int(state.limit):
+                state.saturated = True
+            return TransferSlot(self, host)
+
+    def acquire(self, url: str) -> TransferSlot:
+        with self.condition:
+            while True:
+                slot = self.try_acquire(url)
+                if slot:
+                    return slot
+                self.condition.wait(self.interval)
+
+    async def acquire_async(self, url: str) -> TransferSlot:
+        import asyncio  # only the async engine needs it; keeps it off the CLI startup
+
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                slot = self.try_acquire(url)
+                if slot:
+                    return slot
+                waiter = loop.create_future()
+                self.waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, self.interval)
+            except asyncio.TimeoutError:
+                with self.condition:
+                    if waiter in self.waiters:
+                        self.waiters.remove(waiter)
+
+    def limits(self) -> Dict[str, int]:
+        with self.condition:
+            return {host: int(state.limit) for host, state in self.hosts.items()}
+
+    def _release(self, host: str, size: int, error: bool) -> None:
+        with self.condition:
+            state = self.hosts[host]
+            state.in_flight -= 1
+            state.bytes += size
+            state.errors += int(error)
+            self._adjust(state)
+            self.condition.notify_all()
+            waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+    def _adjust(self, state: HostState) -> None:
+        now = time.monotonic()
+        elapsed = now - state.window_start
+        if elapsed < self.interval:
+            return
+        throughput = state.bytes / elapsed
+        if state.errors:
+            state.limit *= DECREASE_FACTOR
+            state.direction = 1
+            state.slow_start = False
+        elif state.saturated and state.slow_start:
+            if throughput > state.throughput * (1 + TOLERANCE):
+                state.limit *= INCREASE_FACTOR
+            else:
+                state.slow_start = False
+        elif state.saturated:
+            if throughput < state.throughput * (1 - TOLERANCE):
+                state.direction = -state.direction
+                state.limit += state.direction
+            elif throughput > state.throughput * (1 + TOLERANCE):
+                state.limit += state.direction
+        state.limit = min(max(state.limit, self.minimum), self.maximum)
+        state.throughput = throughput
+        state.window_start = now
+        state.bytes = state.errors = 0
+        state.saturated = False
+
+
+def _wake(waiter: "asyncio.Future") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def parse_concurrency(value: str) -> Union[str, int]:
+    """Parse `--concurrency`, which is either "auto" or a positive number."""
+    if value == "auto":
+        return value
+    workers = int(value)
+    if workers < 1:
+        raise ValueError(value)
+    return workers
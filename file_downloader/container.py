@@ -1,31 +1,260 @@
+import importlib
+import json
+from typing import Any, Callable, Dict
+
 from dependency_injector import containers, providers
 
-from file_downloader import (PexelsDownloader, PixabayDownloader,
+from concurrency import AdaptiveConcurrency
+from dedup_store import DedupStore
+from file_downloader import (FileSaver, PexelsDownloader, PixabayDownloader,
                              ThreadingDownloaderSaveTool, ThreadingFileSaver)
+from http_session import create_session
+from manifest import JobManifest
+from metadata_index import MetadataIndex
+from metrics import Metrics
+from multi_source import MultiSourceDownloader
+from options import SOURCES
+from pack_saver import PackFileSaver
+from prefilter import PreviewFilter
+from rate_limiter import RateLimiter, RetryPolicy
+from search_cache import SearchCache
+from tracing import JsonlSink, Tracer
+from transform import ImageTransform
+from variants import VariantSelector
+
+
+def deferred(module: str, name: str) -> Callable[..., Any]:
+    """Provider callable that imports `module` only when first called."""
+
+    def create(*args, **kwargs):
+        return getattr(importlib.import_module(module), name)(*args, **kwargs)
+
+    return create
 
 
 class Container(containers.DeclarativeContainer):
     config = providers.Configuration()
 
+    trace_sink = providers.Selector(
+        config.trace_sink,
+        jsonl=providers.Singleton(JsonlSink, path=config.trace),
+        off=providers.Object(None),
+    )
+    tracer = providers.Singleton(Tracer, sink=trace_sink)
+    transform = providers.Selector(
+        config.transform,
+        on=providers.Singleton(
+            ImageTransform,
+            width=config.resize_width,
+            height=config.resize_height,
+            image_format=config.format,
+            quality=config.quality,
+        ),
+        off=providers.Object(None),
+    )
+    perceptual_index = providers.Selector(
+        config.dedupe,
+        perceptual=providers.Singleton(
+            deferred("perceptual", "PerceptualIndex"),
+            path=config.index,
+            threshold=config.dedupe_threshold,
+        ),
+        exact=providers.Object(None),
+    )
+    variant_selector = providers.Selector(
+        config.variants,
+        on=providers.Singleton(
+            VariantSelector,
+            max_size=config.max_size,
+            target_bytes=config.target_bytes,
+        ),
+        off=providers.Object(None),
+    )
+    prefilter = providers.Selector(
+        config.prefilter,
+        on=providers.Singleton(
+            PreviewFilter,
+            min_size=config.min_size,
+            aspect_ratio=config.aspect_ratio,
+            predicate=config.filter,
+        ),
+        off=providers.Object(None),
+    )
+    session = providers.Singleton(
+        create_session,
+        workers=config.pool_size,
+        host_limits=config.host_limits,
+        tracer=tracer,
+    )
+    dedup_store = providers.Singleton(
+        DedupStore,
+        path=config.index,
+        variant=config.variant_key,
+    )
+    metadata_index = providers.Selector(
+        config.metadata,
+        on=providers.Singleton(MetadataIndex, path=config.index),
+        off=providers.Object(None),
+    )
+    manifest = providers.Singleton(
+        JobManifest,
+        path=config.index,
+        folder_path=config.save_to,
+        variant=config.variant_key,
+    )
+    controller = providers.Selector(
+        config.controller,
+        auto=providers.Singleton(AdaptiveConcurrency),
+        fixed=providers.Object(None),
+    )
+    metrics = providers.Singleton(Metrics)
+    rate_limiter = providers.Singleton(RateLimiter, rate=config.rate)
+    retry_policy = providers.Singleton(
+        RetryPolicy,
+        retries=config.retries,
+    )
+    search_cache = providers.Selector(
+        config.cache,
+        on=providers.Singleton(
+            SearchCache,
+            path=config.cache_path,
+            ttl=config.cache_ttl,
+            max_entries=config.cache_size,
+            refresh=config.refresh,
+        ),
+        off=providers.Object(None),
+    )
     pixabay_downloader = providers.Factory(
         PixabayDownloader,
-        api_key=config.api_key,
+        api_key=config.api_keys.pixabay,
+        session=session,
+        search_cache=search_cache,
+        manifest=manifest,
+        rate_limiter=rate_limiter,
+        retry_policy=retry_policy,
+        tracer=tracer,
+        file_extension=config.file_extension,
+        variant_selector=variant_selector,
+        prefilter=prefilter,
     )
     pexels_downloader = providers.Factory(
         PexelsDownloader,
-        api_key=config.api_key,
+        api_key=config.api_keys.pexels,
+        session=session,
+        search_cache=search_cache,
+        manifest=manifest,
+        rate_limiter=rate_limiter,
+        retry_policy=retry_policy,
+        tracer=tracer,
+        file_extension=config.file_extension,
+        variant_selector=variant_selector,
+        prefilter=prefilter,
     )
-    downloader = providers.Selector(
-        config.source,
-        pixabay=pixabay_downloader,
-        pexels=pexels_downloader,
+    downloader = providers.Factory(
+        MultiSourceDownloader,
+        downloaders=providers.Dict(
+            pixabay=pixabay_downloader,
+            pexels=pexels_downloader,
+        ),
+        sources=config.source,
+        weights=config.weights,
     )
-    threading_saver = providers.Factory(
-        ThreadingFileSaver,
+    pack_saver = providers.Factory(
+        PackFileSaver,
         folder_path=config.save_to,
+        index_path=config.index,
+        pack_size=config.pack_size,
+        dedup_store=dedup_store,
+        tracer=tracer,
+        fsync=config.fsync,
+        metadata_index=metadata_index,
     )
-    download_save_tool = providers.Factory(
+    threading_saver = providers.Selector(
+        config.output,
+        files=providers.Factory(
+            ThreadingFileSaver,
+            folder_path=config.save_to,
+            dedup_store=dedup_store,
+            tracer=tracer,
+            fsync=config.fsync,
+            transform=transform,
+            perceptual_index=perceptual_index,
+            metadata_index=metadata_index,
+        ),
+        pack=pack_saver,
+    )
+    file_saver = providers.Selector(
+        config.output,
+        files=providers.Factory(
+            FileSaver,
+            folder_path=config.save_to,
+            dedup_store=dedup_store,
+            tracer=tracer,
+            fsync=config.fsync,
+            transform=transform,
+            perceptual_index=perceptual_index,
+            metadata_index=metadata_index,
+        ),
+        pack=pack_saver,
+    )
+    threading_download_save_tool = providers.Factory(
         ThreadingDownloaderSaveTool,
-        file_downlaoder=downloader,
+        downloader,
         file_saver=threading_saver,
+        workers=config.workers,
+        dedup_store=dedup_store,
+        controller=controller,
+        writers=config.writers,
+        write_queue_size=config.write_queue_size,
+        metrics=metrics,
+        tracer=tracer,
+        metadata_index=metadata_index,
+    )
+    async_download_save_tool = providers.Factory(
+        deferred("async_downloader", "AsyncDownloaderSaveTool"),
+        file_downloader=downloader,
+        file_saver=file_saver,
+        concurrency=config.workers,
+        dedup_store=dedup_store,
+        manifest=manifest,
+        rate_limiter=rate_limiter,
+        retry_policy=retry_policy,
+        controller=controller,
+        metrics=metrics,
+        tracer=tracer,
+        metadata_index=metadata_index,
     )
+    download_save_tool = providers.Selector(
+        config.engine,
+        threads=threading_download_save_tool,
+        **{"async": async_download_save_tool},
+    )
+
+
+_containers: Dict[str, Container] = {}
+
+
+def build_container(config: Dict[str, Any]) -> Container:
+    """Container for `config` with API keys from the environment."""
+    key = json.dumps(config, sort_keys=True, default=str)
+    if key not in _containers:
+        container = Container()
+        container.config.from_dict(config)
+        for source in SOURCES:
+            container.config.api_keys[source].from_env(f"API_KEY_{source.upper()}")
+        _containers[key] = container
+    return _containers[key]
+
+
+def close_container(container: Container) -> None:
+    """Flush and release what the container's singletons hold open."""
+    for key, cached in list(_containers.items()):
+        if cached is container:
+            del _containers[key]
+    container.tracer().close()
+    if container.metadata_index():
+        container.metadata_index().flush()
+    if container.transform():
+        container.transform().close()
+    if container.perceptual_index():
+        container.perceptual_index().close()
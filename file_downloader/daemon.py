@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Condition, Thread
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from batch import BatchRunner, Job
+from job_queue import JobQueue
+from metrics import Metrics
+from options import DEFAULT_JOB_WORKERS, SOURCES, parse_sources
+
+logger = logging.getLogger(__name__)
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+class DownloadDaemon:
+    """Long-running downloader that takes jobs over a local HTTP API."""
+
+    def __init__(
+        self,
+        container,
+        job_queue: JobQueue,
+        defaults: Dict[str, Any],
+        job_workers: int = DEFAULT_JOB_WORKERS,
+    ):
+        self.container = container
+        self.job_queue = job_queue
+        self.defaults = defaults
+        self.job_workers = job_workers
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.wakeup = Condition()
+        self.running: Dict[int, Metrics] = {}
+
+    def serve(self, address: Tuple[str, Any]) -> None:
+        """Serve on a parsed `--serve` address until interrupted."""
+        kind, bind = address
+        handler = self._handler()
+        if kind == "unix":
+            if os.path.exists(bind):
+                os.remove(bind)
+            server = UnixHTTPServer(bind, handler)
+        else:
+            server = ThreadingHTTPServer(bind, handler)
+        for _ in range(self.job_workers):
+            Thread(target=self._work, daemon=True).start()
+        print(f"Serving on {kind}:{bind}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def submit(self, fields: Dict[str, Any]) -> int:
+        """Validate a job from the API, store it and wake a worker."""
+        query = fields["query"]
+        sources = fields.get("source") or self.defaults["source"]
+        if not sources:
+            raise ValueError("source is required")
+        job = Job(
+            query=query.split() if isinstance(query, str) else list(query),
+            number_of_files=int(fields.get("n") or self.defaults["n"]),
+            sources=parse_sources(sources) if isinstance(sources, str) else sources,
+            save_to=fields.get("save_to") or self.defaults["save_to"],
+        )
+        unknown_sources = set(job.sources) - set(SOURCES)
+        if unknown_sources:
+            raise ValueError(f"unknown source: {', '.join(sorted(unknown_sources))}")
+        if not job.query or not job.save_to:
+            raise ValueError("query and save_to are required")
+        job_id = self.job_queue.submit(job)
+        with self.wakeup:
+            self.wakeup.notify()
+        return job_id
+
+    def status(self, job_id: int) -> Optional[Dict[str, Any]]:
+        job = self.job_queue.get(job_id)
+        metrics = self.running.get(job_id)
+        if job and metrics:
+            job.update(metrics.snapshot())
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue-wide totals, plus what this process did and how fast."""
+        stats = self.job_queue.counts()
+        session = self.job_queue.counts(since=self.started_at)
+        del session["jobs"]
+        for metrics in list(self.running.values()):
+            totals = metrics.totals()
+            for counters in (stats, session):
+                counters["files"] += totals.files
+                counters["bytes"] += totals.bytes
+                counters["errors"] += totals.errors
+                counters["skipped"] += totals.skipped
+        uptime = time.monotonic() - self.started
+        session["uptime"] = uptime
+        session["bytes_per_second"] = session["bytes"] / uptime
+        session["files_per_second"] = session["files"] / uptime
+        stats["since_start"] = session
+        return stats
+
+    def _work(self) -> None:
+        while True:
+            with self.wakeup:
+                while not (claimed := self.job_queue.claim()):
+                    self.wakeup.wait()
+            self._run(*claimed)
+
+    def _run(self, job_id: int, job: Job) -> None:
+        metrics = Metrics()
+        self.running[job_id] = metrics
+        error = None
+        try:
+            tool = self.container.threading_download_save_tool(
+                metrics=metrics, show_progress=False
+            )
+            BatchRunner(self.container).run([job], tool)
+        except Exception as err:
+            error = str(err)
+            logger.error(f"Error in time of running job {job_id}: {err}.")
+        finally:
+            if self.container.metadata_index():
+                self.container.metadata_index().flush()
+            self.job_queue.finish(job_id, metrics.totals(), error)
+            del self.running[job_id]
+
+    def _handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts == ["stats"]:
+                    self._reply(HTTPStatus.OK, daemon.stats())
+                elif parts == ["jobs"]:
+                    status = parse_qs(url.query).get("status", [None])[0]
+                    self._reply(HTTPStatus.OK, daemon.job_queue.list(status))
+                elif len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+                    job = daemon.status(int(parts[1]))
+                    if job:
+                        self._reply(HTTPStatus.OK, job)
+                    else:
+                        self._reply(HTTPStatus.NOT_FOUND, {"error": "no such job"})
+                else:
+                    self._reply(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+            def do_POST(self) -> None:
+                if urlsplit(self.path).path.strip("/") != "jobs":
+                    self._reply(HTTPStatus.NOT_FOUND, {"error": "not found"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    job_id = daemon.submit(json.loads(self.rfile.read(length)))
+                except (KeyError, TypeError, ValueError) as err:
+                    self._reply(HTTPStatus.BAD_REQUEST, {"error": str(err)})
+                    return
+                self._reply(HTTPStatus.ACCEPTED, {"id": job_id, "status": "queued"})
+
+            def _reply(self, status: HTTPStatus, body: Any) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def address_string(self) -> str:
+                # Unix socket peers have no host address.
+                return self.client_address[0] if self.client_address else "unix"
+
+            def log_message(self, format: str, *args) -> None:
+                logger.info(f"{self.address_string()} {format % args}")
+
+        return Handler
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import sqlite3
+from threading import Lock
+from typing import Any, BinaryIO, Dict, List, Optional
+
+# Shards of a multi-process run write to the same index; wait for each
+# other's transactions instead of failing with "database is locked".
+BUSY_TIMEOUT = 30.0
+
+
+class DuplicateFile(Exception):
+    """The downloaded image is a near-duplicate of one already saved."""
+
+
+class HashingWriter:
+    """File wrapper that hashes every chunk on its way to disk."""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.hash = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> int:
+        self.hash.update(chunk)
+        return self.f.write(chunk)
+
+    def hexdigest(self) -> str:
+        return self.hash.hexdigest()
+
+
+class DedupStore:
+    """Persistent content-addressed index of downloaded files."""
+
+    def __init__(self, path: str, variant: str = ""):
+        self.variant = variant
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = Lock()
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS files (
+                key TEXT PRIMARY KEY, digest TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY, path TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS packed_blobs (
+                digest TEXT PRIMARY KEY, path TEXT NOT NULL
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def _keys(self, file_info: Dict[str, Any]) -> List[str]:
+        keys = [f"url:{file_info['url']}"]
+        if file_info.get("file_id") is not None:
+            keys.append(f"id:{file_info.get('source')}:{file_info['file_id']}")
+        if self.variant:
+            keys = [f"{key}:{self.variant}" for key in keys]
+        return keys
+
+    def contains(self, file_info: Dict[str, Any]) -> bool:
+        """Whether the url or API id was already fetched and is still on disk."""
+        keys = self._keys(file_info)
+        placeholders = ",".join("?" * len(keys))
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT blobs.path FROM files JOIN blobs USING (digest) "
+                f"WHERE files.key IN ({placeholders}) "
+                "UNION ALL SELECT packed_blobs.path FROM files "
+                "JOIN packed_blobs USING (digest) "
+                f"WHERE files.key IN ({placeholders})",
+                keys + keys,
+            ).fetchall()
+        return any(os.path.exists(path) for path, in rows)
+
+    def get_path(self, digest: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT path FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+        return row[0] if row and os.path.exists(row[0]) else None
+
+    def add(
+        self, file_info: Dict[str, Any], digest: str, path: str, packed: bool = False
+    ) -> None:
+        """Record that `file_info`'s body, `digest`, is stored at `path`."""
+        table = "packed_blobs" if packed else "blobs"
+        with self.lock, self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO {table} (digest, path) VALUES (?, ?)",
+                (digest, path),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO files (key, digest) VALUES (?, ?)",
+                [(key, digest) for key in self._keys(file_info)],
+            )
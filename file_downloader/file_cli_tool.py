@@ -1,30 +1,352 @@
 import argparse
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-from dotenv import load_dotenv
+from concurrency import DEFAULT_MAXIMUM, parse_concurrency
+from options import (DEFAULT_ADDRESS, DEFAULT_CACHE_PATH, DEFAULT_JOB_WORKERS,
+                     DEFAULT_MAX_ENTRIES, DEFAULT_RETRIES, DEFAULT_TTL,
+                     DEFAULT_WRITE_QUEUE_SIZE, DEFAULT_WRITERS, FORMATS,
+                     INDEX_FILE_NAME, PACK_SIZE, PHASH_THRESHOLD,
+                     QUEUE_FILE_NAME, SOURCES, parse_address, parse_bytes,
+                     parse_host_limits, parse_ratio_range, parse_resize,
+                     parse_sources, parse_weights, variant_key)
 
-from container import Container
+if TYPE_CHECKING:
+    from batch import Job
 
-load_dotenv()
+# dotenv, dependency_injector, requests and aiohttp are imported in `main`
+# only after the arguments are valid; benchmarks/import_benchmark.py holds
+# the imports above to a startup budget.
 
 
-if __name__ == "__main__":
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Download images from different resources")
+    parser.add_argument("-q", action="extend", nargs="+", help="query for API")
+    parser.add_argument("-n", help="number of images", default=1, type=int)
+    parser.add_argument("--save-to", type=str, help="folder for saving images")
     parser.add_argument(
-        "-q", action="extend", nargs="+", required=True, help="query for API"
+        "--source",
+        type=parse_sources,
+        help=f"comma separated sources to search in parallel: {', '.join(SOURCES)}",
+    )
+    parser.add_argument(
+        "--weights",
+        type=parse_weights,
+        default={},
+        help="share of -n per source, e.g. pixabay=2,pexels=1 (default: equal)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["threads", "async"],
+        default="threads",
+        help="download engine: a thread pool or an asyncio event loop",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=parse_concurrency,
+        help="parallel downloads: a number, or 'auto' to tune it per host "
+        "(default: 10 threads, 200 for async)",
+    )
+    parser.add_argument(
+        "--writers",
+        type=int,
+        default=DEFAULT_WRITERS,
+        help="threads writing downloaded files to disk",
+    )
+    parser.add_argument(
+        "--write-queue-size",
+        type=int,
+        default=DEFAULT_WRITE_QUEUE_SIZE,
+        help="chunks each writer may have queued before downloads wait",
+    )
+    parser.add_argument(
+        "--host-limits",
+        type=parse_host_limits,
+        default={},
+        help="max connections per host, e.g. images.pexels.com=4,pixabay.com=8",
+    )
+    parser.add_argument(
+        "--index",
+        help=f"dedup, resume and metadata index (default: <save-to>/{INDEX_FILE_NAME})",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="retries for 429, 5xx and dropped connections",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="max requests per second to each host (default: unlimited until "
+        "a host sends rate-limit headers or a 429)",
+    )
+    parser.add_argument(
+        "--cache-path",
+        default=DEFAULT_CACHE_PATH,
+        help="file with cached search responses",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL,
+        help="seconds a cached search response stays valid",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help="max number of cached search responses",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="do not read or write the cache"
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="ignore cached responses, store new ones"
+    )
+    parser.add_argument(
+        "--no-metadata",
+        action="store_true",
+        help="do not record saved images and their API metadata in the index",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        help="write throughput, latency percentiles and a time series here",
+    )
+    parser.add_argument(
+        "--trace",
+        help="append dns/connect/tls/ttfb/transfer/write spans here as JSON lines",
+    )
+    parser.add_argument(
+        "--profile",
+        help="write a cProfile dump of the run here (pstats, snakeviz, flameprof)",
+    )
+    parser.add_argument(
+        "--fsync", action="store_true", help="fsync every file before renaming it"
+    )
+    parser.add_argument(
+        "--max-size",
+        type=parse_resize,
+        help="download the smallest variant the API offers that still fills "
+        "WxH, e.g. 1920x1080, instead of the default one (default: --resize "
+        "if given)",
+    )
+    parser.add_argument(
+        "--target-bytes",
+        type=parse_bytes,
+        help="cap on the estimated size of the variant picked by --max-size, "
+        "or of the default variant without it: if over, the largest variant "
+        "under it is downloaded, e.g. 500K or 2M",
     )
-    parser.add_argument("-n", help="number of images", default=1, type=int)
     parser.add_argument(
-        "--save-to", type=str, required=True, help="folder for saving images"
+        "--resize",
+        type=parse_resize,
+        help="shrink images to fit WxH after download, e.g. 1024x or 1024x768 "
+        "(needs Pillow)",
     )
-    parser.add_argument("--source", choices=["pixabay", "pexels"], required=True)
-    args_dict = vars(parser.parse_args())
+    parser.add_argument(
+        "--format",
+        choices=list(FORMATS),
+        help="convert images to this format after download (needs Pillow)",
+    )
+    parser.add_argument(
+        "--quality", type=int, help="jpeg/webp quality for --resize and --format"
+    )
+    parser.add_argument(
+        "--min-size",
+        type=parse_resize,
+        help="skip images smaller than WxH, e.g. 1920x1080 or 1920x, "
+        "checked against the search metadata before downloading",
+    )
+    parser.add_argument(
+        "--aspect-ratio",
+        type=parse_ratio_range,
+        help="skip images whose width/height is outside MIN:MAX, e.g. 1.3:1.8, "
+        "16/9: or :1",
+    )
+    parser.add_argument(
+        "--filter",
+        help="module:function called with (file info, preview bytes); images "
+        "it returns False for are not downloaded",
+    )
+    parser.add_argument(
+        "--dedupe",
+        choices=["exact", "perceptual"],
+        default="exact",
+        help="perceptual also drops resized or re-encoded copies of saved "
+        "images (needs NumPy and Pillow)",
+    )
+    parser.add_argument(
+        "--dedupe-threshold",
+        type=int,
+        default=PHASH_THRESHOLD,
+        help="max differing bits of two 64-bit image hashes that count as "
+        "duplicates",
+    )
+    parser.add_argument(
+        "--output",
+        choices=["files", "pack"],
+        default="files",
+        help="one file per image, or images appended to rolling pack files "
+        "indexed by name and API id",
+    )
+    parser.add_argument(
+        "--pack-size",
+        type=parse_bytes,
+        default=PACK_SIZE,
+        help="size at which --output pack starts a new pack, e.g. 512M",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="worker processes sharing the downloads, each with its own pool",
+    )
+    parser.add_argument(
+        "--jobs",
+        help="file with one job per line (.jsonl or tab separated "
+        "query, n, source, save_to) to run through one shared pool",
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const=DEFAULT_ADDRESS,
+        type=parse_address,
+        help=f"run as a daemon taking jobs over HTTP on host:port or "
+        f"unix:/path.sock (default: {DEFAULT_ADDRESS}); -q, --source and "
+        f"--save-to become defaults for submitted jobs",
+    )
+    parser.add_argument(
+        "--queue",
+        help=f"durable job queue of --serve (default: <save-to>/{QUEUE_FILE_NAME})",
+    )
+    parser.add_argument(
+        "--job-workers",
+        type=int,
+        default=DEFAULT_JOB_WORKERS,
+        help="jobs --serve runs at the same time",
+    )
+    return parser
+
+
+def parse_args(
+    argv: Optional[List[str]] = None,
+) -> Tuple[Dict[str, Any], List["Job"]]:
+    """Validate the command line and turn it into the container's config."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not (args.jobs or args.serve or (args.q and args.source and args.save_to)):
+        parser.error("-q, --source and --save-to are required without --jobs")
+    if args.serve and (args.jobs or args.processes > 1 or args.engine != "threads"):
+        parser.error("--serve runs jobs on the threads engine in one process")
+    jobs = []
+    if args.jobs:
+        # batch imports dataclasses, which pulls in inspect; plain runs skip it.
+        from batch import load_jobs
+
+        jobs = load_jobs(args.jobs, args.n, args.source, args.save_to)
+    unknown_sources = set(args.source or []).union(
+        *(job.sources for job in jobs)
+    ) - set(SOURCES)
+    if unknown_sources:
+        parser.error(f"unknown source: {', '.join(sorted(unknown_sources))}")
+    if args.output == "pack" and (
+        args.resize or args.format or args.dedupe == "perceptual"
+    ):
+        parser.error("--output pack stores images as downloaded")
+    if not 0 <= args.dedupe_threshold <= 64:
+        parser.error("--dedupe-threshold must be between 0 and 64")
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+    if args.processes > 1 and args.engine != "threads":
+        parser.error("--processes runs the threads engine in every process")
+    args_dict = vars(args)
+    args_dict["cache"] = "off" if args_dict.pop("no_cache") else "on"
+    args_dict["metadata"] = "off" if args_dict.pop("no_metadata") else "on"
+    args_dict["trace_sink"] = "jsonl" if args_dict["trace"] else "off"
+    args_dict["transform"] = "on" if args.resize or args.format else "off"
+    args_dict["resize_width"], args_dict["resize_height"] = args.resize or (None, None)
+    args_dict["file_extension"] = FORMATS.get(args.format)
+    args_dict["max_size"] = args.max_size or args.resize
+    args_dict["prefilter"] = (
+        "on" if args.min_size or args.aspect_ratio or args.filter else "off"
+    )
+    args_dict["variants"] = (
+        "on" if args_dict["max_size"] or args.target_bytes else "off"
+    )
+    args_dict["variant_key"] = variant_key(
+        {
+            "max_size": args_dict["max_size"],
+            "target_bytes": args.target_bytes,
+            "resize": args.resize,
+            "format": args.format,
+            "quality": args.quality if args.resize or args.format else None,
+        }
+    )
+    concurrency = args_dict.pop("concurrency")
+    args_dict["controller"] = "auto" if concurrency == "auto" else "fixed"
+    args_dict["workers"] = None if concurrency == "auto" else concurrency
+    args_dict["pool_size"] = args_dict["workers"] or DEFAULT_MAXIMUM
+    args_dict["index"] = args_dict["index"] or os.path.join(
+        args_dict["save_to"] or os.curdir, INDEX_FILE_NAME
+    )
+    args_dict["queue"] = args_dict["queue"] or os.path.join(
+        args_dict["save_to"] or os.curdir, QUEUE_FILE_NAME
+    )
+    return args_dict, jobs
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args_dict, jobs = parse_args(argv)
+
+    from dotenv import load_dotenv
+
+    from container import build_container, close_container
+    from tracing import profile
 
-    container = Container()
-    container.config.from_dict(args_dict)
-    container.config.api_key.from_env(f"API_KEY_{args_dict['source'].upper()}")
+    load_dotenv()
+    if args_dict["save_to"]:
+        # Batch jobs create their own folders; an index kept elsewhere
+        # through --index leaves nothing else to create this one.
+        os.makedirs(args_dict["save_to"], exist_ok=True)
+    container = build_container(args_dict)
+    with profile(args_dict["profile"]):
+        if args_dict["serve"]:
+            from daemon import DownloadDaemon
+            from job_queue import JobQueue
 
-    download_save_tool = container.download_save_tool()
-    download_save_tool.run(args_dict["q"], args_dict["n"])
+            DownloadDaemon(
+                container,
+                JobQueue(args_dict["queue"]),
+                args_dict,
+                args_dict["job_workers"],
+            ).serve(args_dict["serve"])
+        elif args_dict["processes"] > 1:
+            from sharding import ShardedRunner
 
-    print()
+            runner = ShardedRunner(container, args_dict, args_dict["processes"])
+            if jobs:
+                runner.run_jobs(jobs)
+            else:
+                runner.run(args_dict["q"], args_dict["n"])
+        elif jobs:
+            from batch import BatchRunner
+
+            BatchRunner(container).run(jobs)
+        else:
+            download_save_tool = container.download_save_tool()
+            download_save_tool.run(args_dict["q"], args_dict["n"])
+    close_container(container)
+
+    if args_dict["metrics_json"]:
+        container.metrics().write_json(args_dict["metrics_json"])
+    if container.prefilter():
+        print(container.prefilter().summary())
+    if container.variant_selector():
+        print(container.variant_selector().summary())
+    print(container.retry_policy().summary())
     print("Done")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,36 @@
+import hashlib
+import itertools
 import logging
+import os
+import time
 import uuid
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor, Future
-from typing import Any, Dict, List, Literal, Optional
+from contextlib import contextmanager, suppress
+from typing import (TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterable,
+                    Iterator, List, Optional, Tuple)
 
 import requests
 
+from dedup_store import DedupStore, DuplicateFile, HashingWriter
+from manifest import TEMP_SUFFIX, JobManifest
+from metadata_index import MetadataIndex
+from metrics import Metrics, show_progress
+from options import PACK_SUFFIX
+from pipeline import DownloadPipeline
+from prefilter import CANDIDATES_PER_FILE, PreviewFilter
+from rate_limiter import RateLimiter, RetryPolicy
+from concurrency import AdaptiveConcurrency
+from search_cache import SearchCache
+from tracing import NULL_TRACER, TimedWriter, Tracer, traced
+from transform import TRANSFORM_SUFFIX, BufferingWriter, ImageTransform
+from variants import Variant, VariantSelector, build_variants
+
+if TYPE_CHECKING:
+    from perceptual import PerceptualIndex
+
 logger = logging.getLogger(__name__)
-SYMBOL: Literal["█"] = "█"
+DEFAULT_WORKERS = 10
+CHUNK_SIZE = 1024 * 1024
 
 
 class FileDownloaderException(Exception):
@@ -17,7 +40,9 @@ class FileDownloaderException(Exception):
 
 class BaseFileDownloader(ABC):
     @abstractmethod
-    def download_file(self, url: str) -> None:
+    def download_file(
+        self, url: str, file_info: Optional[Dict[str, Any]] = None
+    ) -> None:
         ...
 
 
@@ -28,32 +53,217 @@ class BaseFileSaver(ABC):
 
 
 class FileSaver(BaseFileSaver):
-    def __init__(self, folder_path: str):
+    def __init__(
+        self,
+        folder_path: str,
+        dedup_store: Optional[DedupStore] = None,
+        tracer: Optional[Tracer] = None,
+        fsync: bool = False,
+        transform: Optional[ImageTransform] = None,
+        perceptual_index: Optional["PerceptualIndex"] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+    ):
         self.folder_path = folder_path
+        self.dedup_store = dedup_store
+        self.tracer = tracer or NULL_TRACER
+        self.fsync = fsync
+        self.transform = transform
+        self.perceptual_index = perceptual_index
+        self.metadata_index = metadata_index
 
     def save_file(self, file_data: Dict[str, Any]) -> None:
-        with open(f"{self.folder_path}{file_data['file_name']}", "wb") as f:
-            f.write(file_data["file_content"])
+        with self.open_file(file_data["file_name"], file_data) as f:
+            for chunk in file_data["file_chunks"]:
+                f.write(chunk)
+
+    @contextmanager
+    def open_file(
+        self, file_name: str, file_info: Optional[Dict[str, Any]] = None
+    ) -> Iterator[BinaryIO]:
+        """Write into a temp file and rename it to `file_name` once complete."""
+        file_info = file_info or {}
+        path = os.path.join(self.folder_path, file_name)
+        temp_path = path + TEMP_SUFFIX
+        offset = file_info.get("resume_offset", 0)
+        try:
+            with open(temp_path, "ab" if offset else "wb") as f:
+                writer = f
+                if self.dedup_store:
+                    writer = hashing = HashingWriter(f)
+                    if offset:
+                        self._hash_existing(hashing, temp_path, offset)
+                if self.transform or self.perceptual_index:
+                    writer = buffering = BufferingWriter(writer)
+                    if offset:
+                        with open(temp_path, "rb") as existing:
+                            buffering.buffer.write(existing.read(offset))
+                timed = TimedWriter(writer) if self.tracer.enabled else writer
+                yield timed
+                if self.tracer.enabled:
+                    self.tracer.record(
+                        "write",
+                        timed.started or time.perf_counter(),
+                        timed.seconds,
+                        file_name=file_name,
+                        bytes=timed.bytes,
+                    )
+                if self.fsync:
+                    with self.tracer.span("fsync", file_name=file_name):
+                        f.flush()
+                        os.fsync(f.fileno())
+            if self.perceptual_index:
+                duplicate = self._near_duplicate(
+                    buffering.buffer.getvalue(), path, file_name
+                )
+                if duplicate:
+                    if self.dedup_store and file_info.get("url"):
+                        self.dedup_store.add(file_info, hashing.hexdigest(), duplicate)
+                    os.remove(temp_path)
+                    raise DuplicateFile(
+                        f"{file_name} is a near-duplicate of {duplicate}"
+                    )
+            source_path, digest = temp_path, None
+            if self.transform:
+                source_path, digest = self._transform(
+                    buffering.buffer.getvalue(), path, file_name
+                )
+            with self.tracer.span("commit", file_name=file_name):
+                if self.dedup_store:
+                    self._store_unique(
+                        source_path, path, digest or hashing.hexdigest(), file_info
+                    )
+                else:
+                    os.replace(source_path, path)
+            if source_path != temp_path:
+                os.remove(temp_path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(path + TRANSFORM_SUFFIX)
+            if not file_info.get("resumable"):
+                with suppress(FileNotFoundError):
+                    os.remove(temp_path)
+            raise
+        if self.metadata_index and file_info.get("source"):
+            self.metadata_index.add(file_info, path)
+
+    def _near_duplicate(self, data: bytes, path: str, file_name: str) -> Optional[str]:
+        """Path of a saved near-duplicate, or None once `path` is indexed."""
+        try:
+            with self.tracer.span("phash", file_name=file_name):
+                return self.perceptual_index.check_and_add(data, path)
+        except Exception as err:
+            logger.error(f"Error in time of hashing file {file_name}: {err}.")
+            return None
+
+    def _transform(
+        self, data: bytes, path: str, file_name: str
+    ) -> Tuple[str, Optional[str]]:
+        """Write the transformed body next to `path`; return where and its hash."""
+        try:
+            with self.tracer.span("transform", file_name=file_name, bytes=len(data)):
+                data = self.transform.apply(data)
+        except Exception as err:
+            logger.error(f"Error in time of transforming file {file_name}: {err}.")
+            return path + TEMP_SUFFIX, None
+        transformed_path = path + TRANSFORM_SUFFIX
+        with open(transformed_path, "wb") as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        return transformed_path, hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def _hash_existing(writer: HashingWriter, temp_path: str, offset: int) -> None:
+        with open(temp_path, "rb") as f:
+            while offset > 0 and (chunk := f.read(min(CHUNK_SIZE, offset))):
+                writer.hash.update(chunk)
+                offset -= len(chunk)
+
+    def _store_unique(
+        self,
+        temp_path: str,
+        path: str,
+        digest: str,
+        file_info: Optional[Dict[str, Any]],
+    ) -> None:
+        existing_path = self.dedup_store.get_path(digest)
+        try:
+            # Never link to a pack file; indexes written before packed
+            # bodies had their own table may still list one as a blob.
+            if not existing_path or existing_path.endswith(PACK_SUFFIX):
+                raise FileNotFoundError(digest)
+            os.link(existing_path, path)
+            os.remove(temp_path)
+        except OSError:
+            os.replace(temp_path, path)
+            existing_path = path
+        if file_info and file_info.get("url"):
+            self.dedup_store.add(file_info, digest, existing_path)
 
 
 class ThreadingFileSaver(FileSaver):
     def save_file(self, future_obj) -> None:
-        super().save_file(future_obj.result())
+        file_data = future_obj.result()
+        if file_data and not file_data.get("not_modified"):
+            super().save_file(file_data)
 
 
 class FileDownloader(BaseFileDownloader):
+    source = ""
     query_separator = " "
     api_url = ""
-
-    def __init__(self, api_key: str):
+    results_key = ""
+    # Number of hits the API will page through; asking past it is an error.
+    total_key = ""
+    min_per_page = 1
+    max_per_page = 1
+
+    def __init__(
+        self,
+        api_key: str,
+        session: Optional[requests.Session] = None,
+        search_cache: Optional[SearchCache] = None,
+        manifest: Optional[JobManifest] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        tracer: Optional[Tracer] = None,
+        file_extension: Optional[str] = None,
+        variant_selector: Optional[VariantSelector] = None,
+        prefilter: Optional[PreviewFilter] = None,
+    ):
         self.api_key = api_key
-
-    def _get_file_data(self, query: List[str]) -> Optional[Dict[str, Any]]:
+        self.session = session or requests.Session()
+        self.search_cache = search_cache
+        self.manifest = manifest
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.tracer = tracer or NULL_TRACER
+        # Set when the saver converts images, so names match the saved format.
+        self.file_extension = file_extension
+        self.variant_selector = variant_selector
+        self.prefilter = prefilter
+
+    def _get_file_data(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        with self.tracer.span("search", source=self.source, page=page) as span:
+            file_data = self._fetch_file_data(query, page, per_page)
+            span["hits"] = len((file_data or {}).get(self.results_key, []))
+        return file_data
+
+    def _fetch_file_data(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
         file_data = None
+        request_params = self._build_request_params(query, page, per_page)
+        if self.search_cache:
+            cache_key = self.search_cache.build_key(self.api_url, request_params)
+            file_data = self.search_cache.get(cache_key)
+            if file_data is not None:
+                return file_data
         try:
-            response = requests.get(
-                f"{self.api_url}", **self._build_request_params(query)
-            )
+            response = self._request(f"{self.api_url}", **request_params)
             if response.ok:
                 file_data = response.json()
             else:
@@ -61,32 +271,186 @@ class FileDownloader(BaseFileDownloader):
                     f"Something went wrong. Status_code {response.status_code}."
                 )
         except Exception as err:
+            self.retry_policy.count("drop")
             logger.error(f"Error in time of get_file_data: {err}.")
-        else:
-            return file_data
-
-    def _build_request_params(self, query: List[str]):
+            return None
+        if self.search_cache:
+            try:
+                self.search_cache.set(cache_key, file_data)
+            except Exception as err:
+                logger.error(f"Error in time of caching search response: {err}.")
+        return file_data
+
+    def _request(self, url: str, **kwargs) -> requests.Response:
+        """GET through the rate limiter, retrying 429s, 5xx and dropped connections."""
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(url)
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retry_policy.retries:
+                    raise
+            else:
+                if self.rate_limiter:
+                    self.rate_limiter.update(
+                        url, response.status_code, response.headers
+                    )
+                if (
+                    not self.retry_policy.should_retry(response.status_code)
+                    or attempt >= self.retry_policy.retries
+                ):
+                    return response
+                response.close()
+            self.retry_policy.count("retry")
+            time.sleep(self.retry_policy.backoff(attempt))
+            attempt += 1
+
+    def _build_request_params(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ):
         return {"params": {"query": self._build_query(query)}}
 
+    def _get_page_size(self, number_of_files: int) -> int:
+        return max(self.min_per_page, min(number_of_files, self.max_per_page))
+
+    def _iter_hits(self, query: List[str], number_of_files: int) -> Iterator[Dict]:
+        """Yield raw search hits page by page until `number_of_files` are found."""
+        per_page = self._get_page_size(number_of_files)
+        page = 1
+        remaining = number_of_files
+        while remaining > 0:
+            file_data = self._get_file_data(query, page, per_page)
+            if not file_data:
+                return
+            hits = file_data.get(self.results_key, [])
+            yield from hits[:remaining]
+            remaining -= min(len(hits), remaining)
+            if len(hits) < per_page:
+                return
+            total = file_data.get(self.total_key) if self.total_key else None
+            if total is not None and page * per_page >= total:
+                return
+            page += 1
+
+    def _iter_file_paths(self, query: List[str], number_of_files: int) -> Iterator[str]:
+        for hit in self._iter_hits(query, number_of_files):
+            yield self._get_file_path(hit)
+
+    def _iter_files(
+        self, query: List[str], number_of_files: int
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield `number_of_files` files, after the prefilter if there is one."""
+        if not self.prefilter:
+            for hit in self._iter_hits(query, number_of_files):
+                yield self._build_file_info(hit, query)
+            return
+        hits = self._iter_hits(query, number_of_files * CANDIDATES_PER_FILE)
+        files = self.prefilter.filter(
+            (self._build_file_info(hit, query) for hit in hits), self._fetch_preview
+        )
+        yield from itertools.islice(files, number_of_files)
+
+    def _build_file_info(
+        self, hit: Dict[str, Any], query: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """The url to download plus the hit's metadata for the index."""
+        width, height = self._get_dimensions(hit)
+        file_info = {
+            "url": self._select_url(hit),
+            "file_id": hit.get("id"),
+            "source": self.source,
+            "query": " ".join(query).lower() if query else None,
+            "width": width,
+            "height": height,
+            **self._get_metadata(hit),
+        }
+        if self.prefilter:
+            file_info["preview_url"] = self._get_preview_url(hit)
+        return file_info
+
+    def _fetch_preview(self, url: str) -> bytes:
+        with self.tracer.span("preview", url=url) as span:
+            response = self._request(url)
+            response.raise_for_status()
+            span["bytes"] = len(response.content)
+        return response.content
+
     def _build_query(self, query: List[str]) -> str:
         joined_query = self.query_separator.join(query)
         return joined_query
 
-    def download_file(self, url: str) -> Optional[Dict[str, Any]]:
+    def download_file(
+        self, url: str, file_info: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Open the transfer and return the body as a lazy chunk iterator."""
+        headers, entry, offset = {}, None, 0
+        if self.manifest:
+            headers, entry, offset = self.manifest.build_headers(
+                url, (file_info or {}).get("save_to")
+            )
         try:
-            response = requests.get(url, stream=True)
+            started = time.perf_counter()
+            response = self._request(url, stream=True, headers=headers)
+            # `elapsed` stops once the headers are parsed: time to first byte
+            # of the last attempt, connection setup included.
+            self.tracer.record(
+                "ttfb",
+                started,
+                response.elapsed.total_seconds(),
+                url=url,
+                status=response.status_code,
+            )
+            if response.status_code == 304:
+                response.close()
+                logger.info("File is not modified.")
+                return {**(file_info or {"url": url}), "not_modified": True}
+            if response.status_code == 416 and offset:
+                # The `.part` file already holds the whole body.
+                response.close()
+                chunks = iter(())
+            else:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    offset = 0
+                chunks = self.tracer.iter_span(
+                    "transfer", self._iter_chunks(response), url=url
+                )
         except Exception as err:
+            self.retry_policy.count("drop")
             logger.error(f"Error in time of downloading file: {err}.")
         else:
             logger.info("File downloads successfuly.")
+            file_name = (
+                entry["file_name"]
+                if entry
+                else self._create_file_name(response.request.url)
+            )
+            if self.manifest:
+                if response.status_code != 416:
+                    self.manifest.record(url, file_name, response.headers, offset)
+                chunks = self._mark_complete(url, chunks)
             return {
-                "file_content": response.content,
-                "file_name": self._create_file_name(response.request.url),
+                **(file_info or {"url": url}),
+                "file_chunks": chunks,
+                "file_name": file_name,
+                "resume_offset": offset,
+                "resumable": bool(self.manifest),
             }
 
+    @staticmethod
+    def _iter_chunks(response: requests.Response) -> Iterator[bytes]:
+        with response:
+            yield from response.iter_content(CHUNK_SIZE)
+
+    def _mark_complete(self, url: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        yield from chunks
+        self.manifest.mark_complete(url)
+
     def _create_file_name(self, string: str, prefix: str = "prefix") -> str:
         filename = uuid.uuid4().hex
-        file_extension = string.split(".")[-1]
+        file_extension = self.file_extension or string.split(".")[-1]
         full_name = (
             f"{prefix}_{filename}.{file_extension}"
             if prefix
@@ -94,94 +458,224 @@ class FileDownloader(BaseFileDownloader):
         )
         return full_name
 
+    def _select_url(self, hit: Dict[str, Any]) -> str:
+        url = self._get_file_path(hit)
+        if not self.variant_selector:
+            return url
+        return self.variant_selector.select(self._get_variants(hit), url)
+
+    @staticmethod
+    def _get_file_path(hit: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
     @staticmethod
-    def _get_file_paths(file_data: Dict[str, Any]) -> List[str]:
-        raise NotImplemented
+    def _get_variants(hit: Dict[str, Any]) -> List[Variant]:
+        return []
+
+    @staticmethod
+    def _get_dimensions(hit: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+        return None, None
+
+    @staticmethod
+    def _get_preview_url(hit: Dict[str, Any]) -> Optional[str]:
+        return None
+
+    @staticmethod
+    def _get_metadata(hit: Dict[str, Any]) -> Dict[str, Any]:
+        """Author, page url and tags of a hit, as stored in the metadata index."""
+        return {}
+
+    @classmethod
+    def _get_file_paths(
+        cls, file_data: Dict[str, Any], number_of_files: int
+    ) -> List[str]:
+        hits = file_data.get(cls.results_key, [])[:number_of_files]
+        return [cls._get_file_path(hit) for hit in hits]
 
 
 class PixabayDownloader(FileDownloader):
+    source = "pixabay"
     query_separator = "+"
     api_url = "https://pixabay.com/api/"
+    results_key = "hits"
+    total_key = "totalHits"
+    min_per_page = 3
+    max_per_page = 200
+
+    def _build_request_params(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ):
+        params = {"key": self.api_key, "q": self._build_query(query), "page": page}
+        if per_page:
+            params["per_page"] = per_page
+        return {"params": params}
+
+    @staticmethod
+    def _get_file_path(hit: Dict[str, Any]) -> str:
+        return hit["webformatURL"]
 
-    def _build_request_params(self, query: List[str]):
-        return {"params": {"key": self.api_key, "q": self._build_query(query)}}
+    @staticmethod
+    def _get_variants(hit: Dict[str, Any]) -> List[Variant]:
+        # Longest side of each size, as documented by the Pixabay API;
+        # fullHDURL and imageURL are only sent to approved accounts.
+        return build_variants(
+            hit.get("imageWidth"),
+            hit.get("imageHeight"),
+            hit.get("imageSize"),
+            [
+                ("preview", hit.get("previewURL"), (150, 150)),
+                ("webformat", hit.get("webformatURL"), (640, 640)),
+                ("large", hit.get("largeImageURL"), (1280, 1280)),
+                ("fullhd", hit.get("fullHDURL"), (1920, 1920)),
+                ("original", hit.get("imageURL"), (None, None)),
+            ],
+        )
 
     @staticmethod
-    def _get_file_paths(file_data: Dict[str, Any], number_of_files: int) -> List[str]:
-        file_paths = []
-        try:
-            file_paths = [
-                file_data["hits"][i]["webformatURL"] for i in range(number_of_files)
-            ]
-        except IndexError:
-            pass
-        return file_paths
+    def _get_dimensions(hit: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+        return hit.get("imageWidth"), hit.get("imageHeight")
+
+    @staticmethod
+    def _get_preview_url(hit: Dict[str, Any]) -> Optional[str]:
+        return hit.get("previewURL")
+
+    @staticmethod
+    def _get_metadata(hit: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "author": hit.get("user"),
+            "page_url": hit.get("pageURL"),
+            "tags": [
+                tag.strip().lower()
+                for tag in hit.get("tags", "").split(",")
+                if tag.strip()
+            ],
+        }
 
     def _create_file_name(self, string: str, prefix: str = "pixabay") -> str:
         return super()._create_file_name(string, prefix)
 
 
 class PexelsDownloader(FileDownloader):
+    source = "pexels"
     api_url = "https://api.pexels.com/v1/search"
+    results_key = "photos"
+    total_key = "total_results"
+    max_per_page = 80
 
-    def _build_request_params(self, query: List[str]):
+    def _build_request_params(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ):
         headers = {"Authorization": self.api_key}
-        params = {"query": self._build_query(query)}
+        params = {"query": self._build_query(query), "page": page}
+        if per_page:
+            params["per_page"] = per_page
         return {"headers": headers, "params": params}
 
     @staticmethod
-    def _get_file_paths(data: Dict[str, Any], number_of_files: int) -> List[str]:
-        file_paths = []
-        try:
-            file_paths = [
-                data["photos"][i]["src"]["original"] for i in range(number_of_files)
-            ]
-        except IndexError:
-            pass
-        return file_paths
+    def _get_file_path(hit: Dict[str, Any]) -> str:
+        return hit["src"]["original"]
+
+    @staticmethod
+    def _get_variants(hit: Dict[str, Any]) -> List[Variant]:
+        # Pexels resizes to fit these boxes; the cropped variants (portrait,
+        # landscape, tiny) change the picture and are never picked.
+        src = hit.get("src", {})
+        return build_variants(
+            hit.get("width"),
+            hit.get("height"),
+            None,
+            [
+                ("small", src.get("small"), (None, 130)),
+                ("medium", src.get("medium"), (None, 350)),
+                ("large", src.get("large"), (940, 650)),
+                ("large2x", src.get("large2x"), (1880, 1300)),
+                ("original", src.get("original"), (None, None)),
+            ],
+        )
+
+    @staticmethod
+    def _get_dimensions(hit: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+        return hit.get("width"), hit.get("height")
+
+    @staticmethod
+    def _get_preview_url(hit: Dict[str, Any]) -> Optional[str]:
+        return hit.get("src", {}).get("tiny")
+
+    @staticmethod
+    def _get_metadata(hit: Dict[str, Any]) -> Dict[str, Any]:
+        # Pexels hits have no tags.
+        return {"author": hit.get("photographer"), "page_url": hit.get("url")}
 
     def _create_file_name(self, string: str, prefix: str = "pexels") -> str:
         return super()._create_file_name(string, prefix)
 
 
 class ThreadingDownloaderSaveTool:
-    total_files = 0
-    downloaded_files = 0
-
-    def __init__(self, file_downlaoder: BaseFileDownloader, file_saver: BaseFileSaver):
+    def __init__(
+        self,
+        file_downlaoder: BaseFileDownloader,
+        file_saver: BaseFileSaver,
+        workers: Optional[int] = None,
+        dedup_store: Optional[DedupStore] = None,
+        controller: Optional[AdaptiveConcurrency] = None,
+        writers: Optional[int] = None,
+        write_queue_size: Optional[int] = None,
+        metrics: Optional[Metrics] = None,
+        show_progress: bool = True,
+        tracer: Optional[Tracer] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+    ):
         self.file_downloader = file_downlaoder
         self.file_saver = file_saver
+        self.controller = controller
+        self.workers = workers or (controller.maximum if controller else DEFAULT_WORKERS)
+        self.dedup_store = dedup_store
+        self.metadata_index = metadata_index
+        self.writers = writers
+        self.write_queue_size = write_queue_size
+        self.metrics = metrics or Metrics()
+        self.show_progress = show_progress
+        self.tracer = tracer or NULL_TRACER
 
     def run(self, query: str, number_of_files: int) -> None:
-        ThreadingDownloaderSaveTool.total_files = number_of_files
-        file_data = self.file_downloader._get_file_data(query)
-        if file_data:
-            file_paths = self.file_downloader._get_file_paths(
-                file_data, number_of_files
-            )
-            if file_paths:
-                self.download_file_with_threads(file_paths)
-
-    def download_file_with_threads(self, paths: List[str], prefix: str = "") -> None:
-        with ThreadPoolExecutor(10) as pool:
-            futures = [
-                pool.submit(self.file_downloader.download_file, path) for path in paths
-            ]
-            for future in futures:
-                future.add_done_callback(self.progress_bar)
-                future.add_done_callback(self.file_saver.save_file)
-            self.progress_bar(None)
-        logger.info("Done.")
-
-    @staticmethod
-    def progress_bar(future: Future) -> None:
-        percent = 100 * (
-            ThreadingDownloaderSaveTool.downloaded_files
-            / ThreadingDownloaderSaveTool.total_files
+        self.metrics.total_files += number_of_files
+        files = self.file_downloader._iter_files(query, number_of_files)
+        self.download_file_with_threads(files)
+
+    @traced("run")
+    def download_file_with_threads(
+        self, files: Iterable[Dict[str, Any]], prefix: str = ""
+    ) -> None:
+        pipeline = self.build_pipeline(lambda file: self.file_saver)
+        with show_progress(self.metrics, self.show_progress):
+            pipeline.run(self._skip_downloaded(files))
+        logger.info(f"Done. Queue depth peaks: {pipeline.peaks}.")
+
+    def build_pipeline(
+        self, saver_for: Callable[[Dict[str, Any]], FileSaver]
+    ) -> DownloadPipeline:
+        """Separate download workers from dedicated disk writers."""
+        return DownloadPipeline(
+            self.file_downloader,
+            saver_for,
+            download_workers=self.workers,
+            writers=self.writers,
+            write_queue_size=self.write_queue_size,
+            controller=self.controller,
+            metrics=self.metrics,
         )
-        progress = SYMBOL * int(percent) + "-" * int(100 - percent)
-        print(
-            f"\r|{progress}| {percent:.2f}%  {ThreadingDownloaderSaveTool.downloaded_files}/{ThreadingDownloaderSaveTool.total_files}",
-            end="\r",
-        )
-        ThreadingDownloaderSaveTool.downloaded_files += 1
+
+    def _skip_downloaded(
+        self, files: Iterable[Dict[str, Any]]
+    ) -> Iterator[Dict[str, Any]]:
+        """Drop files the dedup store has seen before any request is sent."""
+        for file in files:
+            if self.dedup_store and self.dedup_store.contains(file):
+                logger.info(
+                    f"Skipping {file['url']}: already downloaded with these settings."
+                )
+                if self.metadata_index:
+                    self.metadata_index.add_query(file)
+                self.metrics.add_skipped()
+                continue
+            yield file
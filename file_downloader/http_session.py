@@ -0,0 +1,122 @@
+import functools
+import socket
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+try:
+    from tracing import NULL_TRACER, Tracer
+except ImportError:
+    # The top-level `image_downloader` imports this module from the package.
+    from file_downloader.tracing import NULL_TRACER, Tracer
+
+DEFAULT_WORKERS = 10
+DEFAULT_POOL_CONNECTIONS = 10
+
+
+class TracedConnection:
+    """Emits `dns` and `connect` spans for every new connection."""
+
+    tracer: Tracer = NULL_TRACER
+
+    def _new_conn(self):
+        with self.tracer.span("dns", host=self.host):
+            addresses = list(
+                dict.fromkeys(
+                    info[4][0]
+                    for info in socket.getaddrinfo(
+                        self._dns_host, self.port, 0, socket.SOCK_STREAM
+                    )
+                )
+            )
+        dns_host = self._dns_host
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                started = time.perf_counter()
+                try:
+                    conn = super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError):
+                    if index == len(addresses) - 1:
+                        raise
+                    continue
+                self.connected_at = time.perf_counter()
+                self.tracer.record(
+                    "connect",
+                    started,
+                    self.connected_at - started,
+                    host=self.host,
+                    address=address,
+                )
+                return conn
+        finally:
+            self._dns_host = dns_host
+
+
+class TracedHTTPConnection(TracedConnection, HTTPConnection):
+    pass
+
+
+class TracedHTTPSConnection(TracedConnection, HTTPSConnection):
+    def connect(self):
+        super().connect()
+        self.tracer.record(
+            "tls",
+            self.connected_at,
+            time.perf_counter() - self.connected_at,
+            host=self.host,
+        )
+
+
+class TracingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools open connections that report their phases."""
+
+    def __init__(self, tracer: Tracer, **kwargs):
+        self.tracer = tracer
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": self._traced_pool(HTTPConnectionPool, TracedHTTPConnection),
+            "https": self._traced_pool(HTTPSConnectionPool, TracedHTTPSConnection),
+        }
+
+    def _traced_pool(self, pool_class: type, connection_class: type) -> type:
+        connection_class = type(
+            connection_class.__name__, (connection_class,), {"tracer": self.tracer}
+        )
+        return type(
+            pool_class.__name__, (pool_class,), {"ConnectionCls": connection_class}
+        )
+
+
+def create_session(
+    workers: Optional[int] = None,
+    pool_connections: Optional[int] = None,
+    host_limits: Optional[Dict[str, int]] = None,
+    tracer: Optional[Tracer] = None,
+) -> requests.Session:
+    """Build a keep-alive session shared by all downloads and API calls."""
+    workers = workers or DEFAULT_WORKERS
+    pool_connections = pool_connections or DEFAULT_POOL_CONNECTIONS
+    if tracer and tracer.enabled:
+        adapter_class = functools.partial(TracingHTTPAdapter, tracer)
+    else:
+        adapter_class = HTTPAdapter
+    session = requests.Session()
+    adapter = adapter_class(pool_connections=pool_connections, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    for host, limit in (host_limits or {}).items():
+        host_adapter = adapter_class(
+            pool_connections=1, pool_maxsize=limit, pool_block=True
+        )
+        for scheme in ("https", "http"):
+            session.mount(f"{scheme}://{host}/", host_adapter)
+    return session
@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from batch import Job
+from dedup_store import BUSY_TIMEOUT
+from metrics import ThreadCounters
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueue:
+    """Durable FIFO of download jobs for the daemon, in SQLite WAL mode."""
+
+    def __init__(self, path: str):
+        self.lock = Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                query TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                sources TEXT NOT NULL,
+                save_to TEXT NOT NULL,
+                status TEXT NOT NULL,
+                submitted REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                files INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                errors INTEGER NOT NULL DEFAULT 0,
+                skipped INTEGER NOT NULL DEFAULT 0,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+            """
+        )
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, started = NULL WHERE status = ?",
+                (QUEUED, RUNNING),
+            )
+
+    def submit(self, job: Job) -> int:
+        with self.lock:
+            return self.connection.execute(
+                "INSERT INTO jobs (query, n, sources, save_to, status, submitted) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    json.dumps(job.query),
+                    job.number_of_files,
+                    json.dumps(job.sources),
+                    job.save_to,
+                    QUEUED,
+                    time.time(),
+                ),
+            ).lastrowid
+
+    def claim(self) -> Optional[Tuple[int, Job]]:
+        """Mark the oldest queued job running and return it, if there is one."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT id, query, n, sources, save_to FROM jobs "
+                "WHERE status = ? ORDER BY id LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if not row:
+                return None
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, started = ? WHERE id = ?",
+                (RUNNING, time.time(), row[0]),
+            )
+        job_id, query, number_of_files, sources, save_to = row
+        return job_id, Job(
+            json.loads(query), number_of_files, json.loads(sources), save_to
+        )
+
+    def finish(
+        self, job_id: int, totals: ThreadCounters, error: Optional[str] = None
+    ) -> None:
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, finished = ?, files = ?, bytes = ?, "
+                "errors = ?, skipped = ?, error = ? WHERE id = ?",
+                (
+                    FAILED if error else DONE,
+                    time.time(),
+                    totals.files,
+                    totals.bytes,
+                    totals.errors,
+                    totals.skipped,
+                    error,
+                    job_id,
+                ),
+            )
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        jobs = self._select("WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def list(
+        self, status: Optional[str] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """The most recent `limit` jobs, newest first."""
+        if status:
+            return self._select(
+                "WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)
+            )
+        return self._select("ORDER BY id DESC LIMIT ?", (limit,))
+
+    def counts(self, since: Optional[float] = None) -> Dict[str, Any]:
+        """Jobs per status and the counters of the jobs finished `since`."""
+        with self.lock:
+            statuses = dict(
+                self.connection.execute(
+                    "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+                ).fetchall()
+            )
+            files, size, errors, skipped = self.connection.execute(
+                "SELECT TOTAL(files), TOTAL(bytes), TOTAL(errors), TOTAL(skipped) "
+                "FROM jobs WHERE finished >= ?",
+                (since or 0,),
+            ).fetchone()
+        return {
+            "jobs": {
+                status: statuses.get(status, 0)
+                for status in (QUEUED, RUNNING, DONE, FAILED)
+            },
+            "files": int(files),
+            "bytes": int(size),
+            "errors": int(errors),
+            "skipped": int(skipped),
+        }
+
+    def _select(self, clause: str, parameters: tuple) -> List[Dict[str, Any]]:
+        with self.lock:
+            cursor = self.connection.execute(f"SELECT * FROM jobs {clause}", parameters)
+            rows = cursor.fetchall()
+        columns = [column[0] for column in cursor.description]
+        jobs = []
+        for row in rows:
+            job = dict(zip(columns, row))
+            job["query"] = json.loads(job["query"])
+            job["sources"] = json.loads(job["sources"])
+            jobs.append(job)
+        return jobs
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+from threading import Lock
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from dedup_store import BUSY_TIMEOUT
+
+TEMP_SUFFIX = ".part"
+
+
+class JobManifest:
+    """Per-url record of where a download goes and how to revalidate it."""
+
+    def __init__(
+        self, path: str, folder_path: Optional[str] = None, variant: str = ""
+    ):
+        self.folder_path = folder_path
+        self.variant = variant
+        self.lock = Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS manifest (
+                url TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                expected_length INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                complete INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def _key(self, url: str) -> str:
+        return f"{url}:{self.variant}" if self.variant else url
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT * FROM manifest WHERE url = ?", (self._key(url),)
+            )
+            row = cursor.fetchone()
+        if not row:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def build_headers(
+        self, url: str, folder_path: Optional[str] = None
+    ) -> Tuple[Dict[str, str], Optional[Dict], int]:
+        """Return request headers, the manifest entry and the resume offset."""
+        entry = self.get(url)
+        if not entry:
+            return {}, None, 0
+        path = os.path.join(folder_path or self.folder_path or "", entry["file_name"])
+        headers = {}
+        if entry["complete"] and os.path.exists(path):
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+            return headers, entry, 0
+        try:
+            offset = os.path.getsize(path + TEMP_SUFFIX)
+        except OSError:
+            offset = 0
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            etag = entry["etag"]
+            # If-Range only accepts strong validators.
+            validator = etag if etag and not etag.startswith("W/") else None
+            validator = validator or entry["last_modified"]
+            if validator:
+                headers["If-Range"] = validator
+        return headers, entry, offset
+
+    def record(
+        self, url: str, file_name: str, headers: Mapping[str, str], offset: int
+    ) -> None:
+        expected_length = headers.get("Content-Length")
+        if expected_length is not None:
+            expected_length = int(expected_length) + offset
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?, 0)",
+                (
+                    self._key(url),
+                    file_name,
+                    expected_length,
+                    headers.get("ETag"),
+                    headers.get("Last-Modified"),
+                ),
+            )
+
+    def mark_complete(self, url: str) -> None:
+        with self.lock:
+            self.connection.execute(
+                "UPDATE manifest SET complete = 1 WHERE url = ?", (self._key(url),)
+            )
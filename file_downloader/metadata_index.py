@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from dedup_store import BUSY_TIMEOUT
+
+BATCH_SIZE = 500
+COLUMNS = [
+    "path",
+    "source",
+    "file_id",
+    "query",
+    "url",
+    "page_url",
+    "author",
+    "width",
+    "height",
+    "size",
+    "downloaded",
+]
+
+
+class MetadataIndex:
+    """Searchable record of every saved image and the API metadata behind it."""
+
+    def __init__(self, path: str):
+        self.lock = Lock()
+        self.rows: List[tuple] = []
+        self.tags: List[tuple] = []
+        self.queries: List[tuple] = []
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                file_id TEXT,
+                query TEXT,
+                url TEXT,
+                page_url TEXT,
+                author TEXT,
+                width INTEGER,
+                height INTEGER,
+                size INTEGER,
+                downloaded REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS image_tags (
+                tag TEXT NOT NULL,
+                path TEXT NOT NULL,
+                PRIMARY KEY (tag, path)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS image_queries (
+                query TEXT NOT NULL,
+                source TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                PRIMARY KEY (query, source, file_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS images_query ON images (query, source);
+            CREATE INDEX IF NOT EXISTS images_source_width ON images (source, width);
+            CREATE INDEX IF NOT EXISTS images_width ON images (width, height);
+            CREATE INDEX IF NOT EXISTS images_height ON images (height);
+            CREATE INDEX IF NOT EXISTS images_id ON images (source, file_id);
+            """
+        )
+
+    def add(
+        self, file_info: Dict[str, Any], path: str, size: Optional[int] = None
+    ) -> None:
+        """Buffer a row for the file saved at `path`; `size` defaults to its size."""
+        row = (
+            os.path.abspath(path),
+            file_info.get("source") or "",
+            str(file_info["file_id"]) if file_info.get("file_id") else None,
+            file_info.get("query"),
+            file_info.get("url"),
+            file_info.get("page_url"),
+            file_info.get("author"),
+            file_info.get("width"),
+            file_info.get("height"),
+            os.path.getsize(path) if size is None else size,
+            time.time(),
+        )
+        with self.lock:
+            self.rows.append(row)
+            self.tags.extend((tag, row[0]) for tag in file_info.get("tags") or [])
+        self._write_full_batch()
+
+    def add_query(self, file_info: Dict[str, Any]) -> None:
+        """Buffer that a file already saved was found again by its query."""
+        if not (file_info.get("query") and file_info.get("file_id")):
+            return
+        with self.lock:
+            self.queries.append(
+                (
+                    file_info["query"],
+                    file_info.get("source") or "",
+                    str(file_info["file_id"]),
+                )
+            )
+        self._write_full_batch()
+
+    def flush(self) -> None:
+        with self.lock:
+            batch = self._take()
+        if any(batch):
+            self._write(*batch)
+
+    def _write_full_batch(self) -> None:
+        with self.lock:
+            if len(self.rows) + len(self.queries) < BATCH_SIZE:
+                return
+            batch = self._take()
+        self._write(*batch)
+
+    def _take(self) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+        batch = self.rows, self.tags, self.queries
+        self.rows, self.tags, self.queries = [], [], []
+        return batch
+
+    def _write(
+        self, rows: List[tuple], tags: List[tuple], queries: List[tuple]
+    ) -> None:
+        with self.lock:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO images VALUES "
+                f"({', '.join('?' * len(COLUMNS))})",
+                rows,
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO image_tags VALUES (?, ?)", tags
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO image_queries VALUES (?, ?, ?)", queries
+            )
+            self.connection.execute("COMMIT")
+
+    def find(
+        self,
+        source: Optional[str] = None,
+        query: Optional[str] = None,
+        tag: Optional[str] = None,
+        min_width: Optional[int] = None,
+        min_height: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Saved images matching every given filter, widest first."""
+        clauses, parameters = [], []
+        if source:
+            # With a query, `+` keeps SQLite from scanning the source index,
+            # which matches most rows, instead of the query's small IN list.
+            clauses.append("+source = ?" if query else "source = ?")
+            parameters.append(source)
+        if query:
+            clauses.append(
+                "path IN (SELECT path FROM images WHERE query = ? "
+                "UNION ALL SELECT images.path FROM image_queries "
+                "JOIN images USING (source, file_id) WHERE image_queries.query = ?)"
+            )
+            parameters.extend([query, query])
+        if tag and (min_width or min_height or limit):
+            # Walk the width index and probe the tags row by row, which stops
+            # early; the IN list below is faster for unbounded tag lookups.
+            clauses.append(
+                "EXISTS (SELECT 1 FROM image_tags "
+                "WHERE tag = ? AND image_tags.path = images.path)"
+            )
+            parameters.append(tag.lower())
+        elif tag:
+            clauses.append("path IN (SELECT path FROM image_tags WHERE tag = ?)")
+            parameters.append(tag.lower())
+        if min_width:
+            clauses.append("width >= ?")
+            parameters.append(min_width)
+        if min_height:
+            clauses.append("height >= ?")
+            parameters.append(min_height)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM images"
+        if clauses:
+            sql += f" WHERE {' AND '.join(clauses)}"
+        sql += " ORDER BY width DESC"
+        if limit:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        with self.lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
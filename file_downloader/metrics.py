@@ -0,0 +1,193 @@
+import json
+import math
+import sys
+import time
+from contextlib import contextmanager
+from threading import Event, Lock, Thread, local
+from typing import Any, Dict, Iterator, List, Literal, Optional
+
+SYMBOL: Literal["█"] = "█"
+BAR_WIDTH = 50
+REFRESH_RATE = 4.0
+# Latency buckets grow by 10% from 1 ms, which keeps percentiles within 10%
+# of the true value up to about an hour with 160 counters per thread.
+BUCKET_BASE = 0.001
+BUCKET_GROWTH = 1.1
+BUCKETS = 160
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= BUCKET_BASE:
+        return 0
+    index = int(math.log(seconds / BUCKET_BASE, BUCKET_GROWTH)) + 1
+    return min(index, BUCKETS - 1)
+
+
+def _bucket_upper_bound(index: int) -> float:
+    return BUCKET_BASE * BUCKET_GROWTH**index
+
+
+class ThreadCounters:
+    """Counters written by a single thread only, so updates need no lock."""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.skipped = 0
+        self.latencies = [0] * BUCKETS
+
+
+class Metrics:
+    """Run-wide counters for files, bytes, errors and per-file latency."""
+
+    def __init__(self, total_files: int = 0):
+        self.total_files = total_files
+        self.started = time.monotonic()
+        self.local = local()
+        self.threads: List[ThreadCounters] = []
+        self.samples: List[Dict[str, Any]] = []
+        self.lock = Lock()
+
+    @property
+    def counters(self) -> ThreadCounters:
+        counters = getattr(self.local, "counters", None)
+        if counters is None:
+            counters = self.local.counters = ThreadCounters()
+            with self.lock:
+                self.threads.append(counters)
+        return counters
+
+    def add_bytes(self, size: int) -> None:
+        self.counters.bytes += size
+
+    def add_file(self, latency: float) -> None:
+        counters = self.counters
+        counters.files += 1
+        counters.latencies[_bucket(latency)] += 1
+
+    def add_error(self) -> None:
+        self.counters.errors += 1
+
+    def add_skipped(self) -> None:
+        self.counters.skipped += 1
+
+    def track(self, counters: ThreadCounters) -> None:
+        """Include counters updated elsewhere, e.g. copies from other processes."""
+        with self.lock:
+            self.threads.append(counters)
+
+    def totals(self) -> ThreadCounters:
+        """All counters added up into one picklable `ThreadCounters`."""
+        with self.lock:
+            threads = list(self.threads)
+        totals = ThreadCounters()
+        for counters in threads:
+            totals.files += counters.files
+            totals.bytes += counters.bytes
+            totals.errors += counters.errors
+            totals.skipped += counters.skipped
+            for index, count in enumerate(counters.latencies):
+                totals.latencies[index] += count
+        return totals
+
+    def snapshot(self) -> Dict[str, Any]:
+        totals = self.totals()
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "elapsed": elapsed,
+            "total_files": self.total_files,
+            "files": totals.files,
+            "skipped": totals.skipped,
+            "errors": totals.errors,
+            "bytes": totals.bytes,
+            "bytes_per_second": totals.bytes / elapsed,
+            "files_per_second": totals.files / elapsed,
+            "latency": {
+                f"p{percentile}": self._percentile(totals.latencies, percentile)
+                for percentile in (50, 95, 99)
+            },
+        }
+
+    def sample(self) -> Dict[str, Any]:
+        """Take a snapshot and keep a short time-series point of it."""
+        snapshot = self.snapshot()
+        self.samples.append(
+            {
+                "elapsed": round(snapshot["elapsed"], 3),
+                "files": snapshot["files"],
+                "bytes": snapshot["bytes"],
+                "errors": snapshot["errors"],
+            }
+        )
+        return snapshot
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"summary": self.snapshot(), "samples": self.samples}, f, indent=2)
+
+    @staticmethod
+    def _percentile(latencies: List[int], percentile: int) -> Optional[float]:
+        total = sum(latencies)
+        if not total:
+            return None
+        rank = math.ceil(total * percentile / 100)
+        seen = 0
+        for index, count in enumerate(latencies):
+            seen += count
+            if seen >= rank:
+                return _bucket_upper_bound(index)
+        return None
+
+
+class ProgressRenderer(Thread):
+    """Redraws the progress line at a fixed rate, not on every completion."""
+
+    def __init__(self, metrics: Metrics, rate: float = REFRESH_RATE, show: bool = True):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.interval = 1 / rate
+        self.show = show
+        self.stopped = Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.draw()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+        self.draw()
+        if self.show:
+            print()
+
+    def draw(self) -> None:
+        snapshot = self.metrics.sample()
+        if self.show:
+            sys.stdout.write(f"\r{render(snapshot)}")
+            sys.stdout.flush()
+
+
+def render(snapshot: Dict[str, Any]) -> str:
+    done = snapshot["files"] + snapshot["skipped"] + snapshot["errors"]
+    total = snapshot["total_files"] or done or 1
+    fraction = min(done / total, 1)
+    progress = SYMBOL * int(BAR_WIDTH * fraction) + "-" * (
+        BAR_WIDTH - int(BAR_WIDTH * fraction)
+    )
+    p95 = snapshot["latency"]["p95"]
+    return (
+        f"|{progress}| {100 * fraction:.2f}%  {done}/{total}  "
+        f"{snapshot['bytes_per_second'] / 2**20:.2f} MB/s  "
+        f"p95 {p95 or 0:.2f}s  errors {snapshot['errors']}"
+    )
+
+
+@contextmanager
+def show_progress(metrics: Metrics, show: bool = True) -> Iterator[ProgressRenderer]:
+    renderer = ProgressRenderer(metrics, show=show)
+    renderer.start()
+    try:
+        yield renderer
+    finally:
+        renderer.stop()
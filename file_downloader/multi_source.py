@@ -0,0 +1,115 @@
+import logging
+import queue
+from threading import Event, Thread
+from typing import Any, Dict, Iterator, List, Optional
+
+from file_downloader import BaseFileDownloader, FileDownloader
+
+logger = logging.getLogger(__name__)
+QUEUE_SIZE = 100
+_DONE = object()
+
+
+class SourceFeed(Thread):
+    """Runs one source's paginated search and buffers its files in a queue."""
+
+    def __init__(
+        self,
+        downloader: FileDownloader,
+        query: List[str],
+        number_of_files: int,
+        stop: Event,
+    ):
+        super().__init__(daemon=True)
+        self.downloader = downloader
+        self.query = query
+        self.number_of_files = number_of_files
+        self.stop = stop
+        self.files: queue.Queue = queue.Queue(QUEUE_SIZE)
+        self.taken = 0
+        self.exhausted = False
+
+    def run(self) -> None:
+        try:
+            for file in self.downloader._iter_files(self.query, self.number_of_files):
+                if not self._put(file):
+                    return
+        except Exception as err:
+            logger.error(f"Error in time of searching {self.downloader.source}: {err}.")
+        finally:
+            self._put(_DONE)
+
+    def _put(self, item: Any) -> bool:
+        while not self.stop.is_set():
+            try:
+                self.files.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def next_file(self) -> Optional[Dict[str, Any]]:
+        item = self.files.get()
+        if item is _DONE:
+            self.exhausted = True
+            return None
+        self.taken += 1
+        return item
+
+
+class MultiSourceDownloader(BaseFileDownloader):
+    """Fans a query out to several sources and merges their result streams."""
+
+    def __init__(
+        self,
+        downloaders: Dict[str, FileDownloader],
+        sources: Optional[List[str]] = None,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.downloaders = downloaders
+        self.sources = list(sources or [])
+        self.weights = {
+            source: float((weights or {}).get(source, 1.0)) for source in self.sources
+        }
+
+    def _iter_files(
+        self, query: List[str], number_of_files: int
+    ) -> Iterator[Dict[str, Any]]:
+        stop = Event()
+        feeds = [
+            SourceFeed(self.downloaders[source], query, number_of_files, stop)
+            for source in self.sources
+        ]
+        for feed in feeds:
+            feed.start()
+        found = 0
+        try:
+            while found < number_of_files:
+                active = [feed for feed in feeds if not feed.exhausted]
+                if not active:
+                    return
+                feed = min(
+                    active,
+                    key=lambda feed: feed.taken / self.weights[feed.downloader.source],
+                )
+                file = feed.next_file()
+                if file is None:
+                    continue
+                found += 1
+                yield file
+        finally:
+            stop.set()
+
+    def download_file(
+        self, url: str, file_info: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        downloader = self.downloaders[(file_info or {})["source"]]
+        return downloader.download_file(url, file_info)
+
+    def _create_file_name(self, string: str, prefix: str = "") -> str:
+        source = (
+            prefix
+            if prefix in self.downloaders
+            else next(iter(self.sources or self.downloaders))
+        )
+        return self.downloaders[source]._create_file_name(string)
@@ -0,0 +1,107 @@
+"""Parsers for command line values."""
+# Imported before argument parsing: keep requests, aiohttp and DI out of here.
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+SOURCES = ["pixabay", "pexels"]
+# Defaults of the CLI flags, kept here so `--help` does not import the
+# modules that use them.
+INDEX_FILE_NAME = ".download_index.sqlite"
+QUEUE_FILE_NAME = ".download_queue.sqlite"
+DEFAULT_WRITERS = 2
+DEFAULT_WRITE_QUEUE_SIZE = 8
+DEFAULT_RETRIES = 3
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "image_downloader", "search.sqlite"
+)
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 10_000
+# Image formats --format converts to, and the file extension of each.
+FORMATS = {"jpeg": "jpg", "png": "png", "webp": "webp"}
+# Where `--serve` listens, and how many jobs it runs at the same time.
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+DEFAULT_JOB_WORKERS = 4
+# Size at which `--output pack` starts a new pack file.
+PACK_SIZE = 2**30
+PACK_SUFFIX = ".blob"
+# Max differing bits of two 64-bit image hashes for `--dedupe perceptual`.
+PHASH_THRESHOLD = 8
+
+
+def parse_sources(value: str) -> List[str]:
+    """Parse `--source pixabay,pexels` into a list of unique source names."""
+    sources = list(dict.fromkeys(filter(None, value.split(","))))
+    if not sources:
+        raise ValueError(value)
+    return sources
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """Parse `--weights pixabay=2,pexels=1`."""
+    weights = {}
+    for item in filter(None, value.split(",")):
+        source, _, weight = item.partition("=")
+        weights[source.strip()] = float(weight)
+    return weights
+
+
+def parse_host_limits(value: Optional[str]) -> Dict[str, int]:
+    """Parse "host=limit,host=limit" as given on the command line."""
+    host_limits = {}
+    for item in filter(None, (value or "").split(",")):
+        host, _, limit = item.partition("=")
+        host = urlsplit(host).netloc or host
+        host_limits[host.strip()] = int(limit)
+    return host_limits
+
+
+def variant_key(settings: Dict[str, Any]) -> str:
+    """Stable text of the set values, e.g. `format=webp,max_size=1920x1080`."""
+    return ",".join(
+        f"{name}={'x'.join(str(side or '') for side in value)}"
+        if isinstance(value, tuple)
+        else f"{name}={value}"
+        for name, value in sorted(settings.items())
+        if value
+    )
+
+
+def parse_resize(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """Parse `--resize 1024x768`; either side may be left out, as in `1024x`."""
+    width, separator, height = value.lower().partition("x")
+    if not separator or not (width or height):
+        raise ValueError(value)
+    return int(width) if width else None, int(height) if height else None
+
+
+def parse_bytes(value: str) -> int:
+    """Parse a byte count such as `500000`, `500K` or `2M`."""
+    units = {"K": 2**10, "M": 2**20, "G": 2**30}
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def parse_ratio_range(value: str) -> Tuple[Optional[float], Optional[float]]:
+    """Parse `--aspect-ratio 1.3:1.8`, `16/9:` or `:1`; width over height."""
+    low, separator, high = value.partition(":")
+    if not separator or not (low or high):
+        raise ValueError(value)
+
+    def ratio(part: str) -> Optional[float]:
+        if not part:
+            return None
+        numerator, _, denominator = part.partition("/")
+        return float(numerator) / float(denominator or 1)
+
+    return ratio(low), ratio(high)
+
+
+def parse_address(value: str) -> Tuple[str, Any]:
+    """Parse `--serve unix:/path/to.sock`, `host:port` or a bare port."""
+    if value.startswith("unix:"):
+        return "unix", value[len("unix:"):]
+    host, _, port = value.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
@@ -0,0 +1,210 @@
+import mmap
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: packs are only shared between threads.
+    fcntl = None
+
+from dedup_store import BUSY_TIMEOUT, DedupStore, HashingWriter
+from file_downloader import BaseFileSaver
+from metadata_index import MetadataIndex
+from options import PACK_SIZE, PACK_SUFFIX
+from tracing import NULL_TRACER, Tracer
+
+PACK_PREFIX = "pack-"
+PACK_NAME = PACK_PREFIX + "{:05d}" + PACK_SUFFIX
+SPOOL_SIZE = 8 * 2**20
+COPY_SIZE = 8 * 2**20
+# Serializes appends of this process; flock does the same across processes.
+_append_lock = Lock()
+
+
+@contextmanager
+def _locked(pack: BinaryIO) -> Iterator[None]:
+    with _append_lock:
+        if fcntl:
+            fcntl.flock(pack.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(pack.fileno(), fcntl.LOCK_UN)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(
+        path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+    )
+    connection.executescript(
+        """
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        CREATE TABLE IF NOT EXISTS packed (
+            file_name TEXT PRIMARY KEY,
+            source TEXT,
+            file_id TEXT,
+            pack TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            digest TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS packed_id ON packed (source, file_id);
+        CREATE INDEX IF NOT EXISTS packed_digest ON packed (digest);
+        """
+    )
+    return connection
+
+
+class PackFileSaver(BaseFileSaver):
+    """Appends images to rolling pack files instead of one file per image."""
+
+    def __init__(
+        self,
+        folder_path: str,
+        index_path: str,
+        pack_size: Optional[int] = None,
+        dedup_store: Optional[DedupStore] = None,
+        tracer: Optional[Tracer] = None,
+        fsync: bool = False,
+        metadata_index: Optional[MetadataIndex] = None,
+    ):
+        self.folder_path = folder_path
+        self.pack_size = pack_size or PACK_SIZE
+        self.dedup_store = dedup_store
+        self.tracer = tracer or NULL_TRACER
+        self.fsync = fsync
+        self.metadata_index = metadata_index
+        self.index_folder = os.path.dirname(os.path.abspath(index_path))
+        self.connection = _connect(index_path)
+        self.index_lock = Lock()
+        self.number: Optional[int] = None
+
+    def save_file(self, file_data: Dict[str, Any]) -> None:
+        with self.open_file(file_data["file_name"], file_data) as f:
+            for chunk in file_data["file_chunks"]:
+                f.write(chunk)
+
+    @contextmanager
+    def open_file(
+        self, file_name: str, file_info: Optional[Dict[str, Any]] = None
+    ) -> Iterator[BinaryIO]:
+        """Spool the body, then append it to the newest pack and index it."""
+        file_info = file_info or {}
+        with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as spool:
+            hashing = HashingWriter(spool)
+            yield hashing
+            digest = hashing.hexdigest()
+            with self.tracer.span("commit", file_name=file_name) as span:
+                location = self._find_digest(digest)
+                if location:
+                    span["deduplicated"] = True
+                else:
+                    location = self._append(spool)
+                pack_path, offset, length = location
+                with self.index_lock:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO packed VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            file_name,
+                            file_info.get("source"),
+                            str(file_info["file_id"])
+                            if file_info.get("file_id") is not None
+                            else None,
+                            os.path.relpath(pack_path, self.index_folder),
+                            offset,
+                            length,
+                            digest,
+                        ),
+                    )
+        if self.dedup_store and file_info.get("url"):
+            self.dedup_store.add(file_info, digest, pack_path, packed=True)
+        if self.metadata_index and file_info.get("source"):
+            self.metadata_index.add(file_info, f"{pack_path}#{file_name}", length)
+
+    def _find_digest(self, digest: str) -> Optional[Tuple[str, int, int]]:
+        with self.index_lock:
+            row = self.connection.execute(
+                "SELECT pack, offset, length FROM packed WHERE digest = ? LIMIT 1",
+                (digest,),
+            ).fetchone()
+        if not row:
+            return None
+        pack_path = os.path.join(self.index_folder, row[0])
+        return (pack_path, row[1], row[2]) if os.path.exists(pack_path) else None
+
+    def _append(self, spool: BinaryIO) -> Tuple[str, int, int]:
+        """Copy `spool` to the end of the newest pack that is not full."""
+        length = spool.tell()
+        spool.seek(0)
+        if self.number is None:
+            self.number = self._newest_pack()
+        while True:
+            path = os.path.join(self.folder_path, PACK_NAME.format(self.number))
+            with open(path, "ab") as pack, _locked(pack):
+                offset = pack.seek(0, os.SEEK_END)
+                if offset and offset >= self.pack_size:
+                    self.number += 1
+                    continue
+                shutil.copyfileobj(spool, pack, COPY_SIZE)
+                pack.flush()
+                if self.fsync:
+                    os.fsync(pack.fileno())
+            return path, offset, length
+
+    def _newest_pack(self) -> int:
+        os.makedirs(self.folder_path, exist_ok=True)
+        numbers = [
+            int(name[len(PACK_PREFIX) : -len(PACK_SUFFIX)])
+            for name in os.listdir(self.folder_path)
+            if name.startswith(PACK_PREFIX) and name.endswith(PACK_SUFFIX)
+        ]
+        return max(numbers, default=0)
+
+
+class PackReader:
+    """Random access to packed images by file name or API id, through mmap."""
+
+    def __init__(self, index_path: str):
+        self.index_folder = os.path.dirname(os.path.abspath(index_path))
+        self.connection = _connect(index_path)
+        self.maps: Dict[str, mmap.mmap] = {}
+
+    def read(self, file_name: str) -> Optional[bytes]:
+        row = self.connection.execute(
+            "SELECT pack, offset, length FROM packed WHERE file_name = ?",
+            (file_name,),
+        ).fetchone()
+        return self._read(*row) if row else None
+
+    def read_id(self, source: str, file_id: Any) -> Optional[bytes]:
+        row = self.connection.execute(
+            "SELECT pack, offset, length FROM packed "
+            "WHERE source = ? AND file_id = ? LIMIT 1",
+            (source, str(file_id)),
+        ).fetchone()
+        return self._read(*row) if row else None
+
+    def _read(self, pack: str, offset: int, length: int) -> bytes:
+        mapped = self.maps.get(pack)
+        if mapped is None or offset + length > len(mapped):
+            # Packs still being written grow, so map them again to see the end.
+            if mapped is not None:
+                mapped.close()
+            with open(os.path.join(self.index_folder, pack), "rb") as f:
+                mapped = self.maps[pack] = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        return mapped[offset : offset + length]
+
+    def close(self) -> None:
+        for mapped in self.maps.values():
+            mapped.close()
+        self.connection.close()
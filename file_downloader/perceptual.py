@@ -0,0 +1,144 @@
+import importlib.util
+import io
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from dedup_store import BUSY_TIMEOUT
+from options import PHASH_THRESHOLD
+
+# Only imported by the container, and only for `--dedupe perceptual`, so
+# NumPy and Pillow stay optional for every other run.
+HASH_SIZE = 8
+INITIAL_CAPACITY = 1024
+# Set-bit counts of every 16-bit value, for NumPy builds without bitwise_count.
+_POPCOUNT_16 = np.array([bin(value).count("1") for value in range(2**16)], np.uint8)
+
+
+def dhash(data: bytes) -> int:
+    """64-bit difference hash of an image; runs in a worker process."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        pixels = np.asarray(
+            image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS),
+            dtype=np.int16,
+        )
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def _to_signed(value: int) -> int:
+    """SQLite integers are signed 64-bit."""
+    return value - 2**64 if value >= 2**63 else value
+
+
+class PerceptualIndex:
+    """Persistent index of image hashes with a vectorized Hamming-distance scan."""
+
+    def __init__(
+        self,
+        path: str,
+        threshold: int = PHASH_THRESHOLD,
+        processes: Optional[int] = None,
+    ):
+        if importlib.util.find_spec("PIL") is None:
+            raise ImportError("--dedupe perceptual needs Pillow: pip install Pillow")
+        self.threshold = threshold
+        self.lock = Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS phashes (
+                id INTEGER PRIMARY KEY, hash INTEGER NOT NULL, path TEXT NOT NULL
+            );
+            """
+        )
+        self.ids = np.zeros(INITIAL_CAPACITY, np.int64)
+        self.hashes = np.zeros(INITIAL_CAPACITY, np.int64)
+        self.size = 0
+        self.last_id = 0
+        self._load_new()
+        self.pool = ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def hash(self, data: bytes) -> int:
+        return self.pool.submit(dhash, data).result()
+
+    def find(self, image_hash: int) -> Optional[str]:
+        """Path of a stored image within `threshold` bits of `image_hash`."""
+        if not self.size:
+            return None
+        stored = self.hashes[: self.size].view(np.uint64)
+        difference = stored ^ np.uint64(image_hash)
+        if hasattr(np, "bitwise_count"):
+            distances = np.bitwise_count(difference)
+        else:
+            distances = _POPCOUNT_16[difference.view(np.uint16)].reshape(-1, 4).sum(1)
+        for index in np.flatnonzero(distances <= self.threshold):
+            row = self.connection.execute(
+                "SELECT path FROM phashes WHERE id = ?", (int(self.ids[index]),)
+            ).fetchone()
+            # A match whose file is gone (deleted, or its save failed) is stale.
+            if row and os.path.exists(row[0]):
+                return row[0]
+        return None
+
+    def check_and_add(self, data: bytes, path: str) -> Optional[str]:
+        """Path of a near-duplicate of `data`, or None after indexing `data`."""
+        image_hash = self.hash(data)
+        with self.lock:
+            # IMMEDIATE takes the write lock up front, so no other process
+            # can add a matching row between the lookup and the insert.
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._load_new()
+                duplicate = self.find(image_hash)
+                if not duplicate:
+                    row_id = self.connection.execute(
+                        "INSERT INTO phashes (hash, path) VALUES (?, ?)",
+                        (_to_signed(image_hash), path),
+                    ).lastrowid
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            if not duplicate:
+                self._append([(row_id, _to_signed(image_hash))])
+        return duplicate
+
+    def _load_new(self) -> None:
+        """Mirror the rows added since the last load, by any process."""
+        self._append(
+            self.connection.execute(
+                "SELECT id, hash FROM phashes WHERE id > ? ORDER BY id",
+                (self.last_id,),
+            ).fetchall()
+        )
+
+    def _append(self, rows: List[Tuple[int, int]]) -> None:
+        if not rows:
+            return
+        size = self.size + len(rows)
+        if size > len(self.hashes):
+            capacity = max(size, 2 * len(self.hashes))
+            self.ids = np.resize(self.ids, capacity)
+            self.hashes = np.resize(self.hashes, capacity)
+        self.ids[self.size : size], self.hashes[self.size : size] = zip(*rows)
+        self.size = size
+        self.last_id = rows[-1][0]
+
+    def close(self) -> None:
+        self.pool.shutdown()
+        self.connection.close()
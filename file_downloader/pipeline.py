@@ -0,0 +1,186 @@
+import logging
+import queue
+import time
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional
+
+from concurrency import AdaptiveConcurrency
+from dedup_store import DuplicateFile
+from metrics import Metrics
+from options import DEFAULT_WRITE_QUEUE_SIZE, DEFAULT_WRITERS
+
+if TYPE_CHECKING:
+    from file_downloader import BaseFileDownloader, FileSaver
+
+logger = logging.getLogger(__name__)
+URLS_PER_WORKER = 2
+_DONE = object()
+OPEN, WRITE, CLOSE, ABORT = "open", "write", "close", "abort"
+
+
+class DownloadPipeline:
+    """Staged search -> download -> write pipeline with bounded queues."""
+
+    def __init__(
+        self,
+        file_downloader: "BaseFileDownloader",
+        saver_for: Callable[[Dict[str, Any]], "FileSaver"],
+        download_workers: int,
+        writers: Optional[int] = None,
+        write_queue_size: Optional[int] = None,
+        controller: Optional[AdaptiveConcurrency] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.file_downloader = file_downloader
+        self.saver_for = saver_for
+        self.download_workers = download_workers
+        self.controller = controller
+        self.metrics = metrics or Metrics()
+        self.url_queue: queue.Queue = queue.Queue(download_workers * URLS_PER_WORKER)
+        self.write_queues: List[queue.Queue] = [
+            queue.Queue(write_queue_size or DEFAULT_WRITE_QUEUE_SIZE)
+            for _ in range(writers or DEFAULT_WRITERS)
+        ]
+        self.lock = Lock()
+        self.downloading = 0
+        self.writing = 0
+        self.peaks = {"urls": 0, "writes": 0}
+
+    def run(self, files: Iterable[Dict[str, Any]]) -> None:
+        downloaders = [
+            Thread(target=self._download_worker, daemon=True)
+            for _ in range(self.download_workers)
+        ]
+        writers = [
+            Thread(target=self._write_worker, args=(write_queue,), daemon=True)
+            for write_queue in self.write_queues
+        ]
+        for thread in downloaders + writers:
+            thread.start()
+        for file in files:
+            self.url_queue.put(file)
+            self._track_peaks()
+        for _ in downloaders:
+            self.url_queue.put(_DONE)
+        for thread in downloaders:
+            thread.join()
+        for write_queue in self.write_queues:
+            write_queue.put(_DONE)
+        for thread in writers:
+            thread.join()
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Items waiting in front of each stage and items inside it."""
+        return {
+            "urls": self.url_queue.qsize(),
+            "downloading": self.downloading,
+            "writes": sum(write_queue.qsize() for write_queue in self.write_queues),
+            "writing": self.writing,
+        }
+
+    def _track_peaks(self) -> None:
+        depths = self.queue_depths()
+        with self.lock:
+            for stage in self.peaks:
+                self.peaks[stage] = max(self.peaks[stage], depths[stage])
+
+    def _add(self, counter: str, value: int) -> None:
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + value)
+
+    def _download_worker(self) -> None:
+        while (file := self.url_queue.get()) is not _DONE:
+            self._add("downloading", 1)
+            try:
+                self._download(file)
+            finally:
+                self._add("downloading", -1)
+
+    def _download(self, file: Dict[str, Any]) -> None:
+        slot = self.controller.acquire(file["url"]) if self.controller else None
+        error = False
+        try:
+            started = time.monotonic()
+            file_data = self.file_downloader.download_file(file["url"], file)
+            if not file_data:
+                error = True
+                self.metrics.add_error()
+                return
+            if file_data.get("not_modified"):
+                self.metrics.add_skipped()
+                return
+            write_queue = self.write_queues[
+                hash(file_data["file_name"]) % len(self.write_queues)
+            ]
+            token = object()
+            saver = self.saver_for(file)
+            write_queue.put((OPEN, token, (file_data, saver, started)))
+            try:
+                for chunk in file_data["file_chunks"]:
+                    self.metrics.add_bytes(len(chunk))
+                    if slot:
+                        slot.bytes += len(chunk)
+                    write_queue.put((WRITE, token, chunk))
+                    self._track_peaks()
+            except Exception as err:
+                error = True
+                write_queue.put((ABORT, token, err))
+                logger.error(f"Error in time of downloading file: {err}.")
+            else:
+                write_queue.put((CLOSE, token, None))
+        finally:
+            if slot:
+                slot.release(error)
+
+    def _write_worker(self, write_queue: queue.Queue) -> None:
+        # token -> (context manager, file, start time) of an open file, or None
+        # once the file failed and its remaining chunks are only drained.
+        open_files: Dict[object, Any] = {}
+        while (item := write_queue.get()) is not _DONE:
+            kind, token, payload = item
+            if kind == OPEN:
+                file_data, saver, started = payload
+                context = saver.open_file(file_data["file_name"], file_data)
+                try:
+                    open_files[token] = (context, context.__enter__(), started)
+                    self._add("writing", 1)
+                except Exception as err:
+                    open_files[token] = None
+                    logger.error(f"Error in time of saving file: {err}.")
+            elif kind == WRITE:
+                entry = open_files.get(token)
+                if entry:
+                    try:
+                        entry[1].write(payload)
+                    except Exception as err:
+                        logger.error(f"Error in time of saving file: {err}.")
+                        open_files[token] = None
+                        self._close(entry[0], err)
+            else:
+                entry = open_files.pop(token, None)
+                try:
+                    saved = entry and self._close(
+                        entry[0], payload if kind == ABORT else None
+                    )
+                except DuplicateFile as duplicate:
+                    logger.info(f"{duplicate}.")
+                    self.metrics.add_skipped()
+                    continue
+                if saved:
+                    self.metrics.add_file(time.monotonic() - entry[2])
+                else:
+                    self.metrics.add_error()
+
+    def _close(self, context: Any, err: Optional[Exception]) -> bool:
+        self._add("writing", -1)
+        try:
+            if err is None:
+                context.__exit__(None, None, None)
+            else:
+                context.__exit__(type(err), err, err.__traceback__)
+        except DuplicateFile:
+            raise
+        except Exception as close_err:
+            logger.error(f"Error in time of saving file: {close_err}.")
+            return False
+        return err is None
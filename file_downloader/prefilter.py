@@ -0,0 +1,151 @@
+import importlib
+import importlib.util
+import io
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+PREVIEW_WORKERS = 32
+# Search results scanned per requested file before a filtered job gives up.
+CANDIDATES_PER_FILE = 20
+
+Predicate = Callable[[Dict[str, Any], bytes], bool]
+
+
+def load_predicate(spec: str) -> Predicate:
+    """Import `package.module:function`, as given to `--filter`."""
+    module, _, name = spec.partition(":")
+    if not module or not name:
+        raise ValueError(f"--filter expects module:function, not {spec!r}")
+    return getattr(importlib.import_module(module), name)
+
+
+def preview_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Width and height from the image header, or None if it cannot be read."""
+    if importlib.util.find_spec("PIL") is None:
+        return None
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except OSError:
+        return None
+
+
+class PreviewFilter:
+    """Two-phase search: filter candidates cheaply, then download the rest."""
+
+    def __init__(
+        self,
+        min_size: Optional[Tuple[Optional[int], Optional[int]]] = None,
+        aspect_ratio: Optional[Tuple[Optional[float], Optional[float]]] = None,
+        predicate: Optional[str] = None,
+        workers: Optional[int] = None,
+    ):
+        self.min_width, self.min_height = min_size or (None, None)
+        self.min_ratio, self.max_ratio = aspect_ratio or (None, None)
+        self.predicate = load_predicate(predicate) if predicate else None
+        self.workers = workers or PREVIEW_WORKERS
+        self.lock = Lock()
+        self.candidates = 0
+        self.passed = 0
+        self.previews = 0
+        self.preview_bytes = 0
+
+    def filter(
+        self, files: Iterable[Dict[str, Any]], fetch: Callable[[str], bytes]
+    ) -> Iterator[Dict[str, Any]]:
+        executor = ThreadPoolExecutor(self.workers)
+        pending: Set[Future] = set()
+        try:
+            for file in files:
+                self._count("candidates")
+                if not self._check_size(file.get("width"), file.get("height")):
+                    continue
+                if not self._needs_preview(file):
+                    self._count("passed")
+                    yield file
+                    continue
+                pending.add(executor.submit(self._check_preview, file, fetch))
+                if len(pending) >= 2 * self.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self._passed(done)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._passed(done)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _needs_preview(self, file: Dict[str, Any]) -> bool:
+        if not file.get("preview_url"):
+            return False
+        has_ratio = self.min_ratio is not None or self.max_ratio is not None
+        has_size = file.get("width") and file.get("height")
+        return bool(self.predicate or (has_ratio and not has_size))
+
+    def _check_size(self, width: Optional[int], height: Optional[int]) -> bool:
+        """Whether `width` x `height` passes; unknown dimensions always do."""
+        if not width or not height:
+            return True
+        if (self.min_width and width < self.min_width) or (
+            self.min_height and height < self.min_height
+        ):
+            return False
+        return self._check_ratio(width, height)
+
+    def _check_ratio(self, width: int, height: int) -> bool:
+        ratio = width / height
+        if self.min_ratio is not None and ratio < self.min_ratio:
+            return False
+        if self.max_ratio is not None and ratio > self.max_ratio:
+            return False
+        return True
+
+    def _check_preview(
+        self, file: Dict[str, Any], fetch: Callable[[str], bytes]
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            preview = fetch(file["preview_url"])
+        except Exception as err:
+            # Better to download a file that should have been dropped than
+            # to drop one because its thumbnail failed.
+            logger.error(f"Error in time of fetching preview: {err}.")
+            return file
+        with self.lock:
+            self.previews += 1
+            self.preview_bytes += len(preview)
+        if not (file.get("width") and file.get("height")):
+            size = preview_size(preview)
+            # Only the ratio survives the downscale, so the minimum size is
+            # not checked against the preview.
+            if size and not self._check_ratio(*size):
+                return None
+        if self.predicate:
+            try:
+                if not self.predicate(file, preview):
+                    return None
+            except Exception as err:
+                logger.error(f"Error in time of filtering file: {err}.")
+                return None
+        return file
+
+    def _passed(self, done: Set[Future]) -> Iterator[Dict[str, Any]]:
+        for future in done:
+            file = future.result()
+            if file:
+                self._count("passed")
+                yield file
+
+    def _count(self, name: str) -> None:
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def summary(self) -> str:
+        return (
+            f"Prefilter: {self.passed} of {self.candidates} candidates passed, "
+            f"{self.previews} previews fetched "
+            f"({self.preview_bytes / 2**10:.0f} KB)"
+        )
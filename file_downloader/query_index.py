@@ -0,0 +1,48 @@
+import argparse
+import json
+import os
+from typing import List, Optional
+
+from metadata_index import MetadataIndex
+from options import INDEX_FILE_NAME
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Find downloaded images by their API metadata"
+    )
+    parser.add_argument(
+        "--index",
+        default=os.path.join(os.curdir, INDEX_FILE_NAME),
+        help="index written by file_cli_tool.py",
+    )
+    parser.add_argument("--source", help="pixabay or pexels")
+    parser.add_argument("-q", nargs="+", help="query the images were found with")
+    parser.add_argument("--tag", help="one tag, e.g. lake")
+    parser.add_argument("--min-width", type=int)
+    parser.add_argument("--min-height", type=int)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument(
+        "--json", action="store_true", help="print every row as JSON, not paths"
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    index = MetadataIndex(args.index)
+    rows = index.find(
+        source=args.source,
+        query=" ".join(args.q).lower() if args.q else None,
+        tag=args.tag,
+        min_width=args.min_width,
+        min_height=args.min_height,
+        limit=args.limit,
+    )
+    index.close()
+    for row in rows:
+        print(json.dumps(row) if args.json else row["path"])
+
+
+if __name__ == "__main__":
+    main()
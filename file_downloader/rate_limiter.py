@@ -0,0 +1,127 @@
+import random
+import time
+from collections import Counter
+from threading import Lock
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+from options import DEFAULT_RETRIES
+
+DEFAULT_BURST = 10
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate can be retuned at runtime."""
+
+    def __init__(self, rate: Optional[float] = None, burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            if self.rate is None:
+                return max(self.blocked_until - now, 0.0)
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def update(self, remaining: int, reset: float) -> None:
+        """Spread the `remaining` quota evenly over the `reset` seconds left."""
+        with self.lock:
+            reset = max(reset, 1.0)
+            if remaining <= 0:
+                self.blocked_until = time.monotonic() + reset
+            else:
+                self.rate = remaining / reset
+                self.tokens = min(self.tokens, remaining)
+
+    def block(self, seconds: float) -> None:
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """One token bucket per host, tuned from the APIs' rate-limit headers."""
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or DEFAULT_BURST
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def reserve(self, url: str) -> float:
+        return self.bucket(url).reserve()
+
+    def acquire(self, url: str) -> None:
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def update(self, url: str, status: int, headers: Mapping[str, str]) -> None:
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            reset_seconds = float(reset)
+            if reset_seconds > 10**9:
+                reset_seconds -= time.time()
+            self.bucket(url).update(int(remaining), reset_seconds)
+        retry_after = headers.get("Retry-After")
+        if status == 429 and retry_after:
+            self.bucket(url).block(parse_retry_after(retry_after))
+
+
+def parse_retry_after(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        from email.utils import parsedate_to_datetime  # rare, and slow to import
+
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+
+
+class RetryPolicy:
+    """Jittered exponential backoff plus a tally of retries and drops."""
+
+    def __init__(self, retries: Optional[int] = None):
+        self.retries = DEFAULT_RETRIES if retries is None else retries
+        self.counts: Counter = Counter()
+        self.lock = Lock()
+
+    @staticmethod
+    def should_retry(status: int) -> bool:
+        return status in RETRY_STATUSES
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        """Full jitter: a random delay up to the capped exponential step."""
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+
+    def count(self, event: str) -> None:
+        with self.lock:
+            self.counts[event] += 1
+
+    def summary(self) -> str:
+        return (
+            f"Retries: {self.counts['retry']}, "
+            f"dropped after {self.retries} retries: {self.counts['drop']}"
+        )
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from dedup_store import BUSY_TIMEOUT
+from options import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+
+MEMORY_ENTRIES = 256
+SECRET_PARAMS = {"key"}
+
+
+class SearchCache:
+    """On-disk TTL + LRU cache of search API responses."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        refresh: bool = False,
+    ):
+        path = path or DEFAULT_CACHE_PATH
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self.refresh = refresh
+        self.lock = Lock()
+        self.memory: "OrderedDict[str, tuple]" = OrderedDict()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        self.connection.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+            """
+        )
+
+    @staticmethod
+    def build_key(url: str, request_params: Dict[str, Any]) -> str:
+        """Hash the request without credentials, so keys are shareable."""
+        params = {
+            name: value
+            for name, value in request_params.get("params", {}).items()
+            if name not in SECRET_PARAMS
+        }
+        normalized = json.dumps({"url": url, "params": params}, sort_keys=True)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.refresh:
+            return None
+        now = time.time()
+        with self.lock:
+            if key in self.memory:
+                created, value = self.memory[key]
+                if now - created < self.ttl:
+                    self.memory.move_to_end(key)
+                    return value
+                del self.memory[key]
+            row = self.connection.execute(
+                "SELECT body, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if not row or now - row[1] >= self.ttl:
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self.lock:
+            self._remember(key, now, value)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict(now)
+
+    def _remember(self, key: str, created: float, value: Dict[str, Any]) -> None:
+        self.memory[key] = (created, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > MEMORY_ENTRIES:
+            self.memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        self.connection.execute(
+            "DELETE FROM responses WHERE created <= ?", (now - self.ttl,)
+        )
+        self.connection.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+            "ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
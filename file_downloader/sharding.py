@@ -0,0 +1,120 @@
+import logging
+import multiprocessing
+import queue
+from threading import Event, Thread
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+from batch import BatchRunner, Job
+from metrics import REFRESH_RATE, ThreadCounters, show_progress
+
+if TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+
+logger = logging.getLogger(__name__)
+FILES_PER_PROCESS = 32
+PUT_TIMEOUT = 1.0
+
+
+class ShardedRunner:
+    """Spreads the downloads of one run over `processes` worker processes."""
+
+    def __init__(self, container, config: Dict[str, Any], processes: int):
+        self.container = container
+        self.config = config
+        self.processes = processes
+
+    def run(self, query: List[str], number_of_files: int) -> None:
+        tool = self.container.threading_download_save_tool()
+        files = tool._skip_downloaded(
+            self.container.downloader()._iter_files(query, number_of_files)
+        )
+        self._run(files, number_of_files)
+
+    def run_jobs(self, jobs: List[Job]) -> None:
+        tool = self.container.threading_download_save_tool()
+        files = BatchRunner(self.container)._interleave(tool, jobs)
+        self._run(
+            (file for _, file in files), sum(job.number_of_files for job in jobs)
+        )
+
+    def _run(self, files: Iterable[Dict[str, Any]], total_files: int) -> None:
+        context = multiprocessing.get_context("spawn")
+        tasks = context.Queue(self.processes * FILES_PER_PROCESS)
+        reports = context.Queue()
+        shards = [
+            context.Process(
+                target=run_shard,
+                args=(shard, self.config, tasks, reports),
+                daemon=True,
+            )
+            for shard in range(self.processes)
+        ]
+        metrics = self.container.metrics()
+        metrics.total_files += total_files
+        shard_counters = [ThreadCounters() for _ in shards]
+        for counters in shard_counters:
+            metrics.track(counters)
+        collector = Thread(
+            target=self._collect, args=(reports, shard_counters), daemon=True
+        )
+        collector.start()
+        for shard in shards:
+            shard.start()
+        with show_progress(metrics):
+            for file in files:
+                self._put(tasks, file, shards)
+            for _ in shards:
+                self._put(tasks, None, shards)
+            for shard in shards:
+                shard.join()
+        reports.put(None)
+        collector.join()
+        failed = [shard.exitcode for shard in shards if shard.exitcode]
+        if failed:
+            logger.error(f"{len(failed)} of {len(shards)} shards failed: {failed}.")
+
+    @staticmethod
+    def _put(
+        tasks: Any, item: Optional[Dict[str, Any]], shards: List["BaseProcess"]
+    ) -> None:
+        """Block while the queue is full, but not on shards that have all died."""
+        while True:
+            try:
+                tasks.put(item, timeout=PUT_TIMEOUT)
+                return
+            except queue.Full:
+                if not any(shard.is_alive() for shard in shards):
+                    raise RuntimeError("every shard process has exited")
+
+    @staticmethod
+    def _collect(reports: Any, shard_counters: List[ThreadCounters]) -> None:
+        while (report := reports.get()) is not None:
+            shard, counters = report
+            shard_counters[shard].__dict__.update(counters.__dict__)
+
+
+def run_shard(shard: int, config: Dict[str, Any], tasks: Any, reports: Any) -> None:
+    """Entry point of a shard process: download files from `tasks` until None."""
+    from container import build_container, close_container
+
+    container = build_container(config)
+    tool = container.threading_download_save_tool()
+    runner = BatchRunner(container)
+    pipeline = tool.build_pipeline(
+        lambda file: runner._saver(file.get("save_to") or config["save_to"])
+    )
+    stopped = Event()
+
+    def report() -> None:
+        while not stopped.wait(1 / REFRESH_RATE):
+            reports.put((shard, tool.metrics.totals()))
+
+    reporter = Thread(target=report, daemon=True)
+    reporter.start()
+    try:
+        pipeline.run(iter(tasks.get, None))
+    finally:
+        stopped.set()
+        reporter.join()
+        reports.put((shard, tool.metrics.totals()))
+        close_container(container)
@@ -0,0 +1,185 @@
+import cProfile
+import functools
+import json
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+
+# Only the standard library is imported here, so the top-level
+# `image_downloader` can share this module with the file downloader.
+
+
+class BaseSink(ABC):
+    @abstractmethod
+    def emit(self, span: Dict[str, Any]) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class NullSink(BaseSink):
+    def emit(self, span: Dict[str, Any]) -> None:
+        pass
+
+
+class MemorySink(BaseSink):
+    """Keeps spans in a list, e.g. to assert on them in a test."""
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def emit(self, span: Dict[str, Any]) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+    def named(self, name: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [span for span in self.spans if span["name"] == name]
+
+
+class JsonlSink(BaseSink):
+    """Appends one JSON object per span to `path`."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "a")
+        self.lock = threading.Lock()
+
+    def emit(self, span: Dict[str, Any]) -> None:
+        line = json.dumps(span, default=str) + "\n"
+        with self.lock:
+            self.file.write(line)
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+class Tracer:
+    """Emits span-style timing events to a sink."""
+
+    def __init__(self, sink: Optional[BaseSink] = None):
+        self.sink = sink or NullSink()
+        self.enabled = not isinstance(self.sink, NullSink)
+        self.origin = time.perf_counter()
+
+    def record(self, name: str, started: float, duration: float, **attrs) -> None:
+        """Emit a span measured by the caller with `perf_counter`."""
+        if not self.enabled:
+            return
+        self.sink.emit(
+            {
+                "name": name,
+                "start": round(started - self.origin, 6),
+                "duration": round(duration, 6),
+                "thread": threading.current_thread().name,
+                **attrs,
+            }
+        )
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """Time the block; attributes added to the yielded dict are emitted too."""
+        if not self.enabled:
+            yield attrs
+            return
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as err:
+            attrs["error"] = type(err).__name__
+            raise
+        finally:
+            self.record(name, started, time.perf_counter() - started, **attrs)
+
+    def iter_span(self, name: str, chunks: Iterator[bytes], **attrs) -> Iterator[bytes]:
+        """Time a lazy body from its first to its last chunk, counting bytes."""
+        if not self.enabled:
+            yield from chunks
+            return
+        with self.span(name, bytes=0, **attrs) as span:
+            for chunk in chunks:
+                span["bytes"] += len(chunk)
+                yield chunk
+
+    def close(self) -> None:
+        self.sink.close()
+
+
+NULL_TRACER = Tracer()
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Method decorator: time each call as a span on `self.tracer`."""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self, "tracer", None) or NULL_TRACER
+            with tracer.span(span_name):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TimedWriter:
+    """File wrapper that adds up the time spent in `write` calls."""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.started: Optional[float] = None
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def write(self, data: bytes) -> int:
+        started = time.perf_counter()
+        if self.started is None:
+            self.started = started
+        written = self.f.write(data)
+        self.seconds += time.perf_counter() - started
+        self.bytes += len(data)
+        return written
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.f, name)
+
+
+@contextmanager
+def profile(path: Optional[str]) -> Iterator[None]:
+    """Run the block under cProfile and dump the stats to `path`."""
+    if not path:
+        yield
+        return
+    import pstats
+
+    profilers = [cProfile.Profile()]
+    per_thread = sys.version_info < (3, 12)
+
+    def start_thread_profiler(*_) -> None:
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        profilers.append(profiler)
+        profiler.enable()
+
+    if per_thread:
+        threading.setprofile(start_thread_profiler)
+    profilers[0].enable()
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        if per_thread:
+            threading.setprofile(None)
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            profiler.disable()
+            stats.add(profiler)
+        stats.dump_stats(path)
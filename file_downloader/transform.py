@@ -0,0 +1,82 @@
+import importlib.util
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Optional
+
+# Pillow is optional: it is only imported inside the worker processes, and
+# only when a transform was asked for.
+DEFAULT_QUALITY = 85
+TRANSFORM_SUFFIX = ".transformed"
+
+
+class BufferingWriter:
+    """File wrapper that keeps a copy of the body for the transform stage."""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.buffer = io.BytesIO()
+
+    def write(self, chunk: bytes) -> int:
+        self.buffer.write(chunk)
+        return self.f.write(chunk)
+
+    def __getattr__(self, name: str):
+        return getattr(self.f, name)
+
+
+def transform_image(
+    data: bytes,
+    width: Optional[int],
+    height: Optional[int],
+    image_format: Optional[str],
+    quality: int,
+) -> bytes:
+    """Shrink `data` to fit `width` x `height` and re-encode it; runs in a worker."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image_format = image_format or image.format.lower()
+        if width or height:
+            # `thumbnail` keeps the aspect ratio and never enlarges.
+            image.thumbnail((width or image.width, height or image.height))
+        if image_format == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality)
+    return output.getvalue()
+
+
+class ImageTransform:
+    """Resize and format conversion of downloaded images in a process pool."""
+
+    def __init__(
+        self,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        image_format: Optional[str] = None,
+        quality: Optional[int] = None,
+        processes: Optional[int] = None,
+    ):
+        if importlib.util.find_spec("PIL") is None:
+            raise ImportError("--resize and --format need Pillow: pip install Pillow")
+        self.width = width
+        self.height = height
+        self.image_format = image_format
+        self.quality = quality or DEFAULT_QUALITY
+        self.pool = ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def apply(self, data: bytes) -> bytes:
+        return self.pool.submit(
+            transform_image,
+            data,
+            self.width,
+            self.height,
+            self.image_format,
+            self.quality,
+        ).result()
+
+    def close(self) -> None:
+        self.pool.shutdown()
@@ -0,0 +1,104 @@
+from threading import Lock
+from typing import List, NamedTuple, Optional, Tuple
+
+# Used to estimate sizes when the API does not report the original's bytes.
+BYTES_PER_PIXEL = 0.3
+
+
+class Variant(NamedTuple):
+    name: str
+    url: str
+    width: int
+    height: int
+    size: float
+
+    @property
+    def area(self) -> int:
+        return self.width * self.height
+
+
+def fit(width: int, height: int, box: Tuple[Optional[int], Optional[int]]):
+    """`width` x `height` scaled down to fit `box`; a None side is unbounded."""
+    box_width, box_height = box
+    scale = min(
+        box_width / width if box_width else 1,
+        box_height / height if box_height else 1,
+        1,
+    )
+    return round(width * scale), round(height * scale)
+
+
+def build_variants(
+    width: Optional[int],
+    height: Optional[int],
+    size: Optional[int],
+    variants: List[Tuple[str, Optional[str], tuple]],
+) -> List[Variant]:
+    """Variants of a `width` x `height` original from (name, url, box) triples."""
+    if not width or not height:
+        return []
+    size = size or width * height * BYTES_PER_PIXEL
+    result = []
+    for name, url, box in variants:
+        if not url:
+            continue
+        variant_width, variant_height = fit(width, height, box)
+        result.append(
+            Variant(
+                name,
+                url,
+                variant_width,
+                variant_height,
+                size * variant_width * variant_height / (width * height),
+            )
+        )
+    return sorted(result, key=lambda variant: variant.area)
+
+
+class VariantSelector:
+    """Picks, per search hit, the smallest variant that is good enough."""
+
+    def __init__(
+        self,
+        max_size: Optional[Tuple[Optional[int], Optional[int]]] = None,
+        target_bytes: Optional[int] = None,
+    ):
+        self.max_size = max_size
+        self.target_bytes = target_bytes
+        self.lock = Lock()
+        self.selected_bytes = 0.0
+        self.default_bytes = 0.0
+
+    def select(self, variants: List[Variant], default_url: str) -> str:
+        if not variants:
+            return default_url
+        default = next(
+            (variant for variant in variants if variant.url == default_url), None
+        )
+        choice = default or variants[-1]
+        if self.max_size:
+            largest = variants[-1]
+            needed = fit(largest.width, largest.height, self.max_size)
+            choice = next(
+                variant
+                for variant in variants
+                if variant is largest
+                or (variant.width >= needed[0] and variant.height >= needed[1])
+            )
+        if self.target_bytes and choice.size > self.target_bytes:
+            affordable = [
+                variant for variant in variants if variant.size <= self.target_bytes
+            ]
+            choice = affordable[-1] if affordable else variants[0]
+        with self.lock:
+            self.selected_bytes += choice.size
+            self.default_bytes += default.size if default else choice.size
+        return choice.url
+
+    def summary(self) -> str:
+        saved = self.default_bytes - self.selected_bytes
+        return (
+            f"Variants: ~{self.selected_bytes / 2**20:.1f} MB selected instead of "
+            f"~{self.default_bytes / 2**20:.1f} MB by default "
+            f"({saved / 2**20:.1f} MB saved, estimated from search metadata)"
+        )
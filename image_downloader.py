@@ -1,23 +1,22 @@
 import logging
 import uuid
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from random import random
-from threading import Lock
-from typing import Any, Dict, List, Literal, Optional
+from concurrent.futures import ThreadPoolExecutor
+from threading import local
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 import requests
 
-from utils import time_me  # progress_bar, image_total, image_downloaded
+from file_downloader.metrics import Metrics, show_progress
+from file_downloader.http_session import create_session
+from file_downloader.tracing import NULL_TRACER, Tracer, traced
 
 logging.basicConfig(level="ERROR")
 logger = logging.getLogger(__name__)
 
-BUFFER_SIZE = 1024
-lock = Lock()
-image_total: int = 0
-image_downloaded: int = 0
-SYMBOL: Literal["█"] = "█"
+BUFFER_SIZE = 256 * 1024
+WORKERS = 10
 
 
 class ImageDownloaderException(Exception):
@@ -31,11 +30,19 @@ class IImageDownloader(ABC):
         ...
 
     @abstractmethod
-    def get_image_data(self, query: List[str]) -> Optional[Dict[str, Any]]:
+    def get_image_data(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
         ...
 
     @abstractmethod
-    def build_request_params(self, query: List[str]):
+    def iter_image_urls(self, query: List[str], number_of_urls: int) -> Iterator[str]:
+        ...
+
+    @abstractmethod
+    def build_request_params(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ):
         ...
 
     @abstractmethod
@@ -54,16 +61,36 @@ class IImageDownloader(ABC):
 class ImageDownloader(IImageDownloader):
     query_separator = " "
     api_url = ""
-
-    def __init__(self, folder_path: str, api_key: str):
+    results_key = ""
+    total_key = ""
+    min_per_page = 1
+    max_per_page = 1
+
+    def __init__(
+        self,
+        folder_path: str,
+        api_key: str,
+        session: Optional[requests.Session] = None,
+        chunk_size: int = BUFFER_SIZE,
+        tracer: Optional[Tracer] = None,
+        metrics: Optional[Metrics] = None,
+    ):
         self.folder_path = folder_path
         self.api_key = api_key
-
-    def get_image_data(self, query: List[str]) -> Optional[Dict[str, Any]]:
+        self.session = session or create_session(WORKERS)
+        self.chunk_size = chunk_size
+        self.tracer = tracer or NULL_TRACER
+        self.metrics = metrics or Metrics()
+        self._buffers = local()
+
+    @traced("search")
+    def get_image_data(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
         image_data = None
         try:
-            response = requests.get(
-                f"{self.api_url}", **self.build_request_params(query)
+            response = self.session.get(
+                f"{self.api_url}", **self.build_request_params(query, page, per_page)
             )
             if response.ok:
                 image_data = response.json()
@@ -76,7 +103,29 @@ class ImageDownloader(IImageDownloader):
         else:
             return image_data
 
-    def build_request_params(self, query: List[str]):
+    def iter_image_urls(self, query: List[str], number_of_urls: int) -> Iterator[str]:
+        """Yield image urls page by page until `number_of_urls` are found."""
+        per_page = max(self.min_per_page, min(number_of_urls, self.max_per_page))
+        page = 1
+        remaining = number_of_urls
+        while remaining > 0:
+            image_data = self.get_image_data(query, page, per_page)
+            if not image_data:
+                return
+            page_size = len(image_data.get(self.results_key, []))
+            image_urls = self.get_image_urls(image_data, remaining)
+            yield from image_urls
+            remaining -= len(image_urls)
+            if page_size < per_page:
+                return
+            total = image_data.get(self.total_key) if self.total_key else None
+            if total is not None and page * per_page >= total:
+                return
+            page += 1
+
+    def build_request_params(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ):
         return {"params": {"query": self.build_query(query)}}
 
     def build_query(self, query: List[str]) -> str:
@@ -87,67 +136,75 @@ class ImageDownloader(IImageDownloader):
         try:
             # import time
             # time.sleep(random.randint(1, 5))
-            response = requests.get(url, stream=True)
+            started = perf_counter()
+            response = self.session.get(url, stream=True)
+            self.tracer.record(
+                "ttfb", started, response.elapsed.total_seconds(), url=url
+            )
             filename = self.create_file_name(response.request.url, prefix)
-            with open(f"{self.folder_path}{filename}", "wb") as f:
-                for data in response.iter_content(BUFFER_SIZE):
-                    f.write(data)
+            with response, open(f"{self.folder_path}{filename}", "wb") as f:
+                with self.tracer.span("transfer", url=url):
+                    self.write_response(response, f)
         except Exception as err:
+            self.metrics.add_error()
             logger.error(f"Error in time of downloading and saving image: {err}.")
         else:
+            self.metrics.add_file(perf_counter() - started)
             logger.info(f"Image {filename} saved successfuly.")
 
-    @time_me
+    def write_response(self, response: requests.Response, f) -> None:
+        """Copy the body into `f` through a per-thread preallocated buffer."""
+        if response.headers.get("Content-Encoding", "identity") != "identity":
+            for data in response.iter_content(self.chunk_size):
+                f.write(data)
+                self.metrics.add_bytes(len(data))
+            return
+        buffer = self.get_buffer()
+        while size := response.raw.readinto(buffer):
+            f.write(buffer[:size])
+            self.metrics.add_bytes(size)
+        # The body is read to the end, so the connection can go back to the
+        # pool instead of being closed with the response.
+        response.raw.release_conn()
+
+    def get_buffer(self) -> memoryview:
+        buffer = getattr(self._buffers, "buffer", None)
+        if buffer is None or len(buffer) != self.chunk_size:
+            buffer = memoryview(bytearray(self.chunk_size))
+            self._buffers.buffer = buffer
+        return buffer
+
+    @traced("download_all")
     def download_and_save_images_with_threads(
-        self, urls: List[str], prefix: str = ""
+        self, urls: Iterable[str], prefix: str = ""
     ) -> None:
-        with ThreadPoolExecutor(10) as pool:
-            pool.map(
-                self.download_and_save_images, urls, [prefix for _ in range(len(urls))]
-            )
+        with ThreadPoolExecutor(WORKERS) as pool:
+            for url in urls:
+                pool.submit(self.download_and_save_images, url, prefix)
 
     def download_and_save_images_with_progress_bar(
-        self, urls: List[str], prefix: str = ""
+        self, urls: Iterable[str], prefix: str = "", total: Optional[int] = None
     ) -> None:
-        start = 0
-        with ThreadPoolExecutor(10) as pool:
-            futures = [
-                pool.submit(self.download_and_save_images, *args)
-                for args in zip(urls, [prefix for _ in range(len(urls))])
-            ]
-            for future in as_completed(futures):
-                progress_bar(start, len(urls))
-                start += 1
+        """Collect every url first, then download them with a progress line."""
+        urls = list(urls)
+        self.download_and_save_images_with_progress_bar_2(
+            urls, prefix, total or len(urls)
+        )
 
     def download_and_save_images_with_progress_bar_2(
-        self, urls: List[str], prefix: str = ""
+        self, urls: Iterable[str], prefix: str = "", total: Optional[int] = None
     ) -> None:
-        global image_total, image_downloaded
-        image_total = len(urls)
-        image_downloaded = 0
-        with ThreadPoolExecutor(10) as pool:
-            futures = [
-                pool.submit(self.download_and_save_images, *args)
-                for args in zip(urls, [prefix for _ in range(len(urls))])
-            ]
-            for future in futures:
-                future.add_done_callback(self.progress_bar)
-            self.progress_bar(None)
+        """Download in the pool while `self.metrics` is drawn at a fixed rate."""
+        self.metrics.total_files = total or 0
+        with show_progress(self.metrics), ThreadPoolExecutor(WORKERS) as pool:
+            submitted = 0
+            for url in urls:
+                pool.submit(self.download_and_save_images, url, prefix)
+                submitted += 1
+            self.metrics.total_files = submitted
         logger.info("Done.")
 
-    @staticmethod  #partial
-    def progress_bar(future) -> None:
-        global lock, image_total, image_downloaded
-        percent = 100 * (image_downloaded / image_total)
-        progress = SYMBOL * int(percent) + "-" * int(100 - percent)
-        # with lock:
-        print(
-                f"\r|{progress}| {percent:.2f}%  {image_downloaded}/{image_total}",
-                end="\r",
-            )
-        image_downloaded += 1
-
-    @time_me
+    @traced("download_all")
     def download_and_save_images_normal(
         self, urls: List[str], prefix: str = ""
     ) -> None:
@@ -168,37 +225,41 @@ class ImageDownloader(IImageDownloader):
 class PixabayImageDownloader(ImageDownloader):
     query_separator = "+"
     api_url = "https://pixabay.com/api/"
-
-    def build_request_params(self, query: List[str]):
-        return {"params": {"key": self.api_key, "q": self.build_query(query)}}
+    results_key = "hits"
+    total_key = "totalHits"
+    min_per_page = 3
+    max_per_page = 200
+
+    def build_request_params(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ):
+        params = {"key": self.api_key, "q": self.build_query(query), "page": page}
+        if per_page:
+            params["per_page"] = per_page
+        return {"params": params}
 
     @staticmethod
     def get_image_urls(data: Dict[str, Any], number_of_urls: int) -> List[str]:
-        image_urls = []
-        try:
-            image_urls = [
-                data["hits"][i]["webformatURL"] for i in range(number_of_urls)
-            ]
-        except IndexError:
-            pass
-        return image_urls
+        return [hit["webformatURL"] for hit in data["hits"][:number_of_urls]]
 
 
 class PexelsImageDownloader(ImageDownloader):
     api_url = "https://api.pexels.com/v1/search"
+    results_key = "photos"
+    total_key = "total_results"
+    max_per_page = 80
 
-    def build_request_params(self, query: List[str]):
+    def build_request_params(
+        self, query: List[str], page: int = 1, per_page: Optional[int] = None
+    ):
         headers = {"Authorization": self.api_key}
-        params = {"query": self.build_query(query)}
+        params = {"query": self.build_query(query), "page": page}
+        if per_page:
+            params["per_page"] = per_page
         return {"headers": headers, "params": params}
 
     @staticmethod
     def get_image_urls(data: Dict[str, Any], number_of_urls: int) -> List[str]:
-        image_urls = []
-        try:
-            image_urls = [
-                data["photos"][i]["src"]["original"] for i in range(number_of_urls)
-            ]
-        except IndexError:
-            pass
-        return image_urls
+        return [
+            photo["src"]["original"] for photo in data["photos"][:number_of_urls]
+        ]
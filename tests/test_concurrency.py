@@ -0,0 +1,119 @@
+"""Unit tests for file_downloader/concurrency.py."""
+import asyncio
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from concurrency import AdaptiveConcurrency, parse_concurrency  # noqa: E402
+
+URL = "https://cdn.pixabay.com/photo/1.jpg"
+HOST = "cdn.pixabay.com"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class AdaptiveConcurrencyTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def window(self, controller, size, error=False):
+        """Fill every slot and release them; the last release ends the window."""
+        slots = []
+        while slot := controller.try_acquire(URL):
+            slots.append(slot)
+        for index, slot in enumerate(slots):
+            if index == len(slots) - 1:
+                self.clock.now += controller.interval
+            list(slot.count([b"x" * size]))
+            slot.release(error)
+        return controller.limits()[HOST]
+
+    def test_limit_bounds_slots_per_host(self):
+        controller = AdaptiveConcurrency(initial=2)
+        first, second = controller.try_acquire(URL), controller.try_acquire(URL)
+        self.assertIsNone(controller.try_acquire(URL))
+        self.assertIsNotNone(controller.try_acquire("https://images.pexels.com/1"))
+        first.release()
+        first.release()
+        self.assertIsNotNone(controller.try_acquire(URL))
+        self.assertIsNone(controller.try_acquire(URL))
+        second.release()
+
+    def test_slow_start_doubles_then_steps(self):
+        controller = AdaptiveConcurrency(initial=2, maximum=64)
+        self.assertEqual(self.window(controller, 1000), 4)
+        self.assertEqual(self.window(controller, 1000), 8)
+        # Throughput stops improving: slow start ends and the limit holds.
+        self.assertEqual(self.window(controller, 1000 // 8), 8)
+        self.assertEqual(self.window(controller, 1000 // 8), 8)
+        # Then it moves by one while throughput improves.
+        self.assertEqual(self.window(controller, 1000), 9)
+
+    def test_errors_halve_the_limit(self):
+        controller = AdaptiveConcurrency(initial=8, minimum=1)
+        self.assertEqual(self.window(controller, 1000, error=True), 4)
+        self.assertEqual(self.window(controller, 1000, error=True), 2)
+        self.assertEqual(self.window(controller, 1000, error=True), 1)
+        self.assertEqual(self.window(controller, 1000, error=True), 1)
+
+    def test_unsaturated_limit_is_left_alone(self):
+        controller = AdaptiveConcurrency(initial=4)
+        slot = controller.try_acquire(URL)
+        self.clock.now += controller.interval
+        list(slot.count([b"x" * 1000]))
+        slot.release()
+        self.assertEqual(controller.limits()[HOST], 4)
+
+
+class WaitTest(unittest.TestCase):
+    def test_release_wakes_waiting_thread_and_coroutine(self):
+        controller = AdaptiveConcurrency(initial=1, interval=5)
+        slot = controller.try_acquire(URL)
+        acquired = []
+
+        def acquire():
+            acquired.append(controller.acquire(URL))
+            acquired[-1].release()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+
+        async def acquire_async():
+            waiting = asyncio.ensure_future(controller.acquire_async(URL))
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiting.done())
+            slot.release()
+            acquired.append(await asyncio.wait_for(waiting, 1))
+            acquired[-1].release()
+
+        asyncio.run(acquire_async())
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(acquired), 2)
+
+
+class ParseConcurrencyTest(unittest.TestCase):
+    def test_values(self):
+        self.assertEqual(parse_concurrency("auto"), "auto")
+        self.assertEqual(parse_concurrency("16"), 16)
+        for value in ("0", "-1", "many"):
+            with self.assertRaises(ValueError):
+                parse_concurrency(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Tests of file_downloader/daemon.py: the job API and running a job."""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from threading import Thread
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader"), os.path.join(ROOT, "benchmarks")]
+
+from stub_server import StubServer  # noqa: E402
+
+
+class DaemonApiTest(unittest.TestCase):
+    """The HTTP API, with no workers taking the submitted jobs."""
+
+    def setUp(self):
+        from daemon import DownloadDaemon
+        from job_queue import JobQueue
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.folder.name, "queue.sqlite"))
+        defaults = {"source": None, "n": 5, "save_to": self.folder.name}
+        self.daemon = DownloadDaemon(mock.Mock(), self.queue, defaults)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.daemon._handler())
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.folder.cleanup()
+
+    def request(self, method, path, body=None):
+        connection = HTTPConnection(*self.server.server_address)
+        try:
+            data = json.dumps(body) if body is not None else None
+            connection.request(method, path, data)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    def test_submit_and_get(self):
+        status, body = self.request(
+            "POST", "/jobs", {"query": "canada lake", "source": "pixabay,pexels"}
+        )
+        self.assertEqual((status, body["status"]), (202, "queued"))
+        status, job = self.request("GET", f"/jobs/{body['id']}")
+        self.assertEqual(status, 200)
+        self.assertEqual(job["query"], ["canada", "lake"])
+        self.assertEqual(job["sources"], ["pixabay", "pexels"])
+        self.assertEqual((job["n"], job["save_to"]), (5, self.folder.name))
+        status, jobs = self.request("GET", "/jobs?status=queued")
+        self.assertEqual([job["id"] for job in jobs], [body["id"]])
+
+    def test_invalid_jobs_are_rejected(self):
+        for body in (
+            {"query": "lake"},
+            {"query": "lake", "source": "flickr"},
+            {"source": "pixabay"},
+        ):
+            status, reply = self.request("POST", "/jobs", body)
+            self.assertEqual(status, 400, body)
+            self.assertIn("error", reply)
+        self.assertEqual(self.queue.list(), [])
+
+    def test_unknown_paths(self):
+        self.assertEqual(self.request("GET", "/jobs/12")[0], 404)
+        self.assertEqual(self.request("GET", "/nothing")[0], 404)
+        self.assertEqual(self.request("POST", "/stats", {})[0], 404)
+
+    def test_stats_only_count_this_run_for_throughput(self):
+        from batch import Job
+        from metrics import ThreadCounters
+
+        earlier = self.queue.submit(Job(["lake"], 1, ["pixabay"], self.folder.name))
+        self.queue.claim()
+        totals = ThreadCounters()
+        totals.files, totals.bytes = 10, 1000
+        with mock.patch("time.time", return_value=self.daemon.started_at - 60):
+            self.queue.finish(earlier, totals)
+        status, stats = self.request("GET", "/stats")
+        self.assertEqual(status, 200)
+        self.assertEqual((stats["files"], stats["bytes"]), (10, 1000))
+        self.assertEqual(stats["jobs"]["done"], 1)
+        self.assertEqual(stats["since_start"]["files"], 0)
+        self.assertEqual(stats["since_start"]["files_per_second"], 0)
+
+
+class DaemonRunTest(unittest.TestCase):
+    def test_runs_a_job_on_the_shared_container(self):
+        import file_cli_tool
+        from container import build_container, close_container
+        from daemon import DownloadDaemon
+        from file_downloader import PixabayDownloader
+        from job_queue import DONE, JobQueue
+
+        with tempfile.TemporaryDirectory() as folder, StubServer(
+            latency=0, image_size=1024, total_hits=50
+        ) as server, mock.patch.object(
+            PixabayDownloader, "api_url", server.url + "/api/"
+        ), mock.patch.dict(
+            os.environ, {"API_KEY_PIXABAY": "stub"}
+        ):
+            config, _ = file_cli_tool.parse_args(
+                ["--serve", "127.0.0.1:0", "--save-to", folder, "--no-cache"]
+            )
+            container = build_container(config)
+            queue = JobQueue(config["queue"])
+            daemon = DownloadDaemon(container, queue, config)
+            save_to = os.path.join(folder, "lakes")
+            job_id = daemon.submit(
+                {"query": "lake", "n": 4, "source": "pixabay", "save_to": save_to}
+            )
+            daemon._run(*queue.claim())
+            close_container(container)
+            job = daemon.status(job_id)
+            self.assertEqual((job["status"], job["files"]), (DONE, 4))
+            self.assertEqual(len(os.listdir(save_to)), 4)
+            self.assertEqual(daemon.stats()["since_start"]["files"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""Unit tests for file_downloader/dedup_store.py."""
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from dedup_store import DedupStore, HashingWriter  # noqa: E402
+
+FILE = {"url": "https://cdn.pixabay.com/1.jpg", "source": "pixabay", "file_id": 1}
+
+
+class DedupStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.index = os.path.join(self.folder.name, "index.sqlite")
+        self.path = os.path.join(self.folder.name, "1.jpg")
+        with open(self.path, "wb") as f:
+            f.write(b"body")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_hashing_writer(self):
+        f = io.BytesIO()
+        writer = HashingWriter(f)
+        writer.write(b"bo")
+        writer.write(b"dy")
+        self.assertEqual(f.getvalue(), b"body")
+        self.assertEqual(writer.hexdigest(), hashlib.sha256(b"body").hexdigest())
+
+    def test_contains_by_url_or_id(self):
+        store = DedupStore(self.index)
+        self.assertFalse(store.contains(FILE))
+        store.add(FILE, "digest", self.path)
+        self.assertTrue(store.contains(FILE))
+        self.assertTrue(store.contains({**FILE, "url": "https://other/1.jpg"}))
+        self.assertFalse(
+            store.contains({**FILE, "url": "https://other/1.jpg", "file_id": 2})
+        )
+        self.assertEqual(store.get_path("digest"), self.path)
+
+    def test_deleted_files_are_not_contained(self):
+        store = DedupStore(self.index)
+        store.add(FILE, "digest", self.path)
+        os.remove(self.path)
+        self.assertFalse(store.contains(FILE))
+        self.assertIsNone(store.get_path("digest"))
+
+    def test_packed_bodies_are_never_link_targets(self):
+        store = DedupStore(self.index)
+        store.add(FILE, "digest", self.path, packed=True)
+        self.assertTrue(store.contains(FILE))
+        self.assertIsNone(store.get_path("digest"))
+
+    def test_variants_are_separate(self):
+        DedupStore(self.index).add(FILE, "digest", self.path)
+        self.assertFalse(DedupStore(self.index, variant="format=png").contains(FILE))
+        self.assertTrue(DedupStore(self.index).contains(FILE))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""End-to-end runs of file_downloader/file_cli_tool.py against the stub server."""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader"), os.path.join(ROOT, "benchmarks")]
+
+from stub_server import StubServer  # noqa: E402
+
+
+class JobsFileTest(unittest.TestCase):
+    def test_jobs_without_top_level_source(self):
+        import file_cli_tool
+        from file_downloader import PexelsDownloader, PixabayDownloader
+
+        # One server per source: a shared one would hand both the same image
+        # urls, and whichever job saved an url first would skip it for the other.
+        with tempfile.TemporaryDirectory() as folder, StubServer(
+            latency=0, image_size=1024, total_hits=50
+        ) as server, StubServer(latency=0, image_size=1024, total_hits=50) as pexels:
+            jobs_path = os.path.join(folder, "jobs.jsonl")
+            with open(jobs_path, "w") as f:
+                for source in ("pixabay", "pexels"):
+                    job = {
+                        "query": "canada lake",
+                        "n": 3,
+                        "source": source,
+                        "save_to": os.path.join(folder, source),
+                    }
+                    f.write(json.dumps(job) + "\n")
+            with mock.patch.object(
+                PixabayDownloader, "api_url", server.url + "/api/"
+            ), mock.patch.object(
+                PexelsDownloader, "api_url", pexels.url + "/v1/search"
+            ), mock.patch.dict(
+                os.environ, {"API_KEY_PIXABAY": "stub", "API_KEY_PEXELS": "stub"}
+            ):
+                file_cli_tool.main(
+                    [
+                        "--jobs",
+                        jobs_path,
+                        "--index",
+                        os.path.join(folder, "index.sqlite"),
+                        "--no-cache",
+                    ]
+                )
+            for source in ("pixabay", "pexels"):
+                self.assertEqual(len(os.listdir(os.path.join(folder, source))), 3)
+
+
+class VariantRerunTest(unittest.TestCase):
+    def run_cli(self, server, argv):
+        import file_cli_tool
+        from file_downloader import PexelsDownloader, PixabayDownloader
+
+        with mock.patch.object(
+            PixabayDownloader, "api_url", server.url + "/api/"
+        ), mock.patch.object(
+            PexelsDownloader, "api_url", server.url + "/v1/search"
+        ), mock.patch.dict(
+            os.environ, {"API_KEY_PIXABAY": "stub", "API_KEY_PEXELS": "stub"}
+        ):
+            file_cli_tool.main(argv)
+
+    def test_rerun_with_other_format_downloads_new_variant(self):
+        from transform import ImageTransform
+
+        with tempfile.TemporaryDirectory() as folder, StubServer(
+            latency=0, image_size=1024, total_hits=50
+        ) as server, mock.patch.object(
+            ImageTransform, "__init__", lambda self, **kwargs: None
+        ), mock.patch.object(
+            ImageTransform, "apply", lambda self, data: b"\x89PNG" + data
+        ), mock.patch.object(
+            ImageTransform, "close", lambda self: None
+        ):
+            save_to = os.path.join(folder, "images")
+            argv = [
+                "-q",
+                "lake",
+                "-n",
+                "3",
+                "--source",
+                "pixabay",
+                "--save-to",
+                save_to,
+                "--index",
+                os.path.join(folder, "index.sqlite"),
+                "--no-cache",
+            ]
+            self.run_cli(server, argv)
+            self.run_cli(server, argv + ["--format", "png"])
+            self.run_cli(server, argv + ["--format", "png", "--resize", "64x"])
+            names = os.listdir(save_to)
+            self.assertEqual(len([n for n in names if n.endswith(".jpg")]), 3)
+            self.assertEqual(len([n for n in names if n.endswith(".png")]), 6)
+            for name in names:
+                with open(os.path.join(save_to, name), "rb") as f:
+                    is_png = f.read(4) == b"\x89PNG"
+                self.assertEqual(is_png, name.endswith(".png"), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
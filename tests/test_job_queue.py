@@ -0,0 +1,81 @@
+"""Unit tests for file_downloader/job_queue.py."""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from batch import Job  # noqa: E402
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue  # noqa: E402
+from metrics import ThreadCounters  # noqa: E402
+
+
+def counters(files, size):
+    totals = ThreadCounters()
+    totals.files, totals.bytes = files, size
+    return totals
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "queue.sqlite")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def job(self, query="lake"):
+        return Job([query], 3, ["pixabay"], self.folder.name)
+
+    def test_claims_in_submission_order(self):
+        queue = JobQueue(self.path)
+        first = queue.submit(self.job("lake"))
+        queue.submit(self.job("sea"))
+        job_id, job = queue.claim()
+        self.assertEqual(job_id, first)
+        self.assertEqual(job, self.job("lake"))
+        self.assertEqual(queue.get(first)["status"], RUNNING)
+        self.assertEqual(queue.claim()[1].query, ["sea"])
+        self.assertIsNone(queue.claim())
+
+    def test_finish_stores_counters_and_errors(self):
+        queue = JobQueue(self.path)
+        done, failed = queue.submit(self.job()), queue.submit(self.job())
+        queue.claim(), queue.claim()
+        queue.finish(done, counters(3, 300))
+        queue.finish(failed, counters(0, 0), "boom")
+        self.assertEqual(queue.get(done)["status"], DONE)
+        self.assertEqual(queue.get(done)["files"], 3)
+        self.assertEqual(
+            (queue.get(failed)["status"], queue.get(failed)["error"]), (FAILED, "boom")
+        )
+        self.assertEqual([job["id"] for job in queue.list(DONE)], [done])
+        self.assertEqual([job["id"] for job in queue.list()], [failed, done])
+
+    def test_running_jobs_are_requeued_on_open(self):
+        queue = JobQueue(self.path)
+        job_id = queue.submit(self.job())
+        queue.claim()
+        self.assertEqual(JobQueue(self.path).get(job_id)["status"], QUEUED)
+
+    def test_counts_since(self):
+        queue = JobQueue(self.path)
+        old, new = queue.submit(self.job()), queue.submit(self.job())
+        queue.claim(), queue.claim()
+        with mock.patch("time.time", return_value=1000.0):
+            queue.finish(old, counters(2, 200))
+        with mock.patch("time.time", return_value=2000.0):
+            queue.finish(new, counters(5, 500))
+        queue.submit(self.job())
+        counts = queue.counts()
+        self.assertEqual(counts["jobs"], {QUEUED: 1, RUNNING: 0, DONE: 2, FAILED: 0})
+        self.assertEqual((counts["files"], counts["bytes"]), (7, 700))
+        since = queue.counts(since=1500.0)
+        self.assertEqual((since["files"], since["bytes"]), (5, 500))
+
+
+if __name__ == "__main__":
+    unittest.main()
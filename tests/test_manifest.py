@@ -0,0 +1,89 @@
+"""Unit tests for file_downloader/manifest.py."""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from manifest import TEMP_SUFFIX, JobManifest  # noqa: E402
+
+URL = "https://cdn.pixabay.com/photo/1.jpg"
+
+
+class JobManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.index = os.path.join(self.folder.name, "index.sqlite")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, name, size):
+        with open(os.path.join(self.folder.name, name), "wb") as f:
+            f.write(b"x" * size)
+
+    def test_unknown_url_has_no_headers(self):
+        manifest = JobManifest(self.index, self.folder.name)
+        self.assertEqual(manifest.build_headers(URL), ({}, None, 0))
+
+    def test_complete_file_is_revalidated(self):
+        manifest = JobManifest(self.index, self.folder.name)
+        headers = {"ETag": '"abc"', "Last-Modified": "Mon", "Content-Length": "3"}
+        manifest.record(URL, "a.jpg", headers, 0)
+        manifest.mark_complete(URL)
+        self.write("a.jpg", 3)
+        headers, entry, offset = manifest.build_headers(URL)
+        self.assertEqual(
+            headers, {"If-None-Match": '"abc"', "If-Modified-Since": "Mon"}
+        )
+        self.assertEqual((entry["file_name"], entry["expected_length"]), ("a.jpg", 3))
+        self.assertEqual(offset, 0)
+
+    def test_partial_file_is_resumed(self):
+        manifest = JobManifest(self.index, self.folder.name)
+        manifest.record(URL, "a.jpg", {"ETag": '"abc"', "Content-Length": "10"}, 0)
+        self.write("a.jpg" + TEMP_SUFFIX, 4)
+        headers, _, offset = manifest.build_headers(URL)
+        self.assertEqual(headers, {"Range": "bytes=4-", "If-Range": '"abc"'})
+        self.assertEqual(offset, 4)
+
+    def test_weak_etag_is_not_used_for_if_range(self):
+        manifest = JobManifest(self.index, self.folder.name)
+        manifest.record(URL, "a.jpg", {"ETag": 'W/"abc"', "Last-Modified": "Mon"}, 0)
+        self.write("a.jpg" + TEMP_SUFFIX, 4)
+        headers, _, _ = manifest.build_headers(URL)
+        self.assertEqual(headers["If-Range"], "Mon")
+
+    def test_resumed_length_includes_offset(self):
+        manifest = JobManifest(self.index, self.folder.name)
+        manifest.record(URL, "a.jpg", {"Content-Length": "6"}, 4)
+        self.assertEqual(manifest.get(URL)["expected_length"], 10)
+
+    def test_folder_override(self):
+        manifest = JobManifest(self.index)
+        manifest.record(URL, "a.jpg", {"ETag": '"abc"'}, 0)
+        manifest.mark_complete(URL)
+        self.write("a.jpg", 3)
+        self.assertEqual(manifest.build_headers(URL)[0], {})
+        self.assertEqual(
+            manifest.build_headers(URL, self.folder.name)[0],
+            {"If-None-Match": '"abc"'},
+        )
+
+    def test_variants_have_separate_rows(self):
+        plain = JobManifest(self.index, self.folder.name)
+        png = JobManifest(self.index, self.folder.name, variant="format=png")
+        plain.record(URL, "a.jpg", {"ETag": '"abc"'}, 0)
+        plain.mark_complete(URL)
+        self.write("a.jpg", 3)
+        self.assertIsNone(png.get(URL))
+        self.assertEqual(png.build_headers(URL), ({}, None, 0))
+        png.record(URL, "a.png", {}, 0)
+        self.assertEqual(plain.get(URL)["file_name"], "a.jpg")
+        self.assertEqual(png.get(URL)["file_name"], "a.png")
+
+
+if __name__ == "__main__":
+    unittest.main()
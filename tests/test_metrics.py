@@ -0,0 +1,81 @@
+"""Unit tests for file_downloader/metrics.py."""
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from metrics import (BUCKET_GROWTH, Metrics, ThreadCounters, render,  # noqa: E402
+                     show_progress)
+
+
+class MetricsTest(unittest.TestCase):
+    def test_threads_are_added_up(self):
+        metrics = Metrics()
+
+        def work():
+            for _ in range(100):
+                metrics.add_file(0.01)
+                metrics.add_bytes(10)
+            metrics.add_error()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics.add_skipped()
+        totals = metrics.totals()
+        self.assertEqual(
+            (totals.files, totals.bytes, totals.errors, totals.skipped),
+            (400, 4000, 4, 1),
+        )
+        self.assertEqual(len(metrics.threads), 5)
+
+    def test_tracked_counters(self):
+        metrics = Metrics()
+        shard = ThreadCounters()
+        shard.files = 7
+        metrics.track(shard)
+        shard.files += 1
+        self.assertEqual(metrics.totals().files, 8)
+
+    def test_percentiles_within_a_bucket(self):
+        metrics = Metrics()
+        for _ in range(90):
+            metrics.add_file(0.1)
+        for _ in range(10):
+            metrics.add_file(2.0)
+        latency = metrics.snapshot()["latency"]
+        self.assertLessEqual(0.1, latency["p50"])
+        self.assertLessEqual(latency["p50"], 0.1 * BUCKET_GROWTH)
+        self.assertLessEqual(2.0, latency["p95"])
+        self.assertLessEqual(latency["p95"], 2.0 * BUCKET_GROWTH)
+        self.assertIsNone(Metrics().snapshot()["latency"]["p50"])
+
+    def test_render(self):
+        snapshot = Metrics(total_files=4).snapshot()
+        snapshot.update(files=1, skipped=1, errors=0)
+        line = render(snapshot)
+        self.assertIn("50.00%", line)
+        self.assertIn("2/4", line)
+
+    def test_samples_are_written(self):
+        metrics = Metrics(total_files=1)
+        with show_progress(metrics, show=False):
+            metrics.add_file(0.01)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "metrics.json")
+            metrics.write_json(path)
+            with open(path) as f:
+                data = json.load(f)
+        self.assertEqual(data["summary"]["files"], 1)
+        self.assertEqual(data["samples"][-1]["files"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Unit tests for file_downloader/multi_source.py."""
+import os
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+
+class FakeDownloader:
+    def __init__(self, source, hits, fail=False):
+        self.source = source
+        self.hits = hits
+        self.fail = fail
+        self.downloaded = []
+
+    def _iter_files(self, query, number_of_files):
+        if self.fail:
+            raise OSError("search failed")
+        for i in range(min(self.hits, number_of_files)):
+            yield {"url": f"{self.source}/{i}", "source": self.source}
+
+    def download_file(self, url, file_info=None):
+        self.downloaded.append(url)
+        return file_info
+
+    def _create_file_name(self, string, prefix=""):
+        return f"{self.source}.jpg"
+
+
+class MultiSourceDownloaderTest(unittest.TestCase):
+    def build(self, weights=None, sources=("pixabay", "pexels"), **hits):
+        from multi_source import MultiSourceDownloader
+
+        self.downloaders = {
+            source: FakeDownloader(source, hits.get(source, 100))
+            for source in ("pixabay", "pexels")
+        }
+        return MultiSourceDownloader(self.downloaders, list(sources), weights)
+
+    def sources(self, files):
+        return [file["source"] for file in files]
+
+    def test_even_split(self):
+        files = list(self.build()._iter_files(["lake"], 10))
+        self.assertEqual(self.sources(files).count("pixabay"), 5)
+        self.assertEqual(self.sources(files).count("pexels"), 5)
+
+    def test_weighted_split(self):
+        files = list(self.build({"pixabay": 3})._iter_files(["lake"], 8))
+        self.assertEqual(self.sources(files).count("pixabay"), 6)
+
+    def test_exhausted_source_leaves_share_to_others(self):
+        files = list(self.build(pexels=2)._iter_files(["lake"], 10))
+        self.assertEqual(len(files), 10)
+        self.assertEqual(self.sources(files).count("pexels"), 2)
+
+    def test_failed_search_is_logged_and_skipped(self):
+        downloader = self.build()
+        self.downloaders["pexels"].fail = True
+        with self.assertLogs("multi_source", "ERROR"):
+            files = list(downloader._iter_files(["lake"], 4))
+        self.assertEqual(self.sources(files), ["pixabay"] * 4)
+
+    def test_downloads_go_to_the_file_source(self):
+        downloader = self.build(sources=())
+        self.assertEqual(list(downloader._iter_files(["lake"], 3)), [])
+        downloader.download_file("u", {"source": "pexels"})
+        self.assertEqual(self.downloaders["pexels"].downloaded, ["u"])
+        self.assertEqual(downloader._create_file_name("u", "pexels"), "pexels.jpg")
+        self.assertEqual(downloader._create_file_name("u"), "pixabay.jpg")
+
+
+if __name__ == "__main__":
+    unittest.main()
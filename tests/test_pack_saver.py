@@ -0,0 +1,64 @@
+"""Round trips through file_downloader/pack_saver.py."""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+
+class PackRoundTripTest(unittest.TestCase):
+    def save(self, saver, file_name, body, file_id):
+        saver.save_file(
+            {
+                "file_name": file_name,
+                "file_chunks": [body[:3], body[3:]],
+                "source": "pixabay",
+                "file_id": file_id,
+            }
+        )
+
+    def test_read_back_by_name_and_id(self):
+        from pack_saver import PackFileSaver, PackReader
+
+        with tempfile.TemporaryDirectory() as folder:
+            index_path = os.path.join(folder, "index.sqlite")
+            saver = PackFileSaver(folder, index_path)
+            self.save(saver, "a.jpg", b"first body", 1)
+            self.save(saver, "b.jpg", b"second body", 2)
+            reader = PackReader(index_path)
+            try:
+                self.assertEqual(reader.read("a.jpg"), b"first body")
+                self.assertEqual(reader.read("b.jpg"), b"second body")
+                self.assertEqual(reader.read_id("pixabay", 2), b"second body")
+                self.assertIsNone(reader.read("missing.jpg"))
+            finally:
+                reader.close()
+
+    def test_folders_sharing_an_index(self):
+        from pack_saver import PackFileSaver, PackReader
+
+        with tempfile.TemporaryDirectory() as folder:
+            index_path = os.path.join(folder, "shared", "index.sqlite")
+            lakes = PackFileSaver(os.path.join(folder, "lakes"), index_path)
+            dogs = PackFileSaver(os.path.join(folder, "dogs"), index_path)
+            self.save(lakes, "lake.jpg", b"lake body", 1)
+            self.save(dogs, "dog.jpg", b"dog body", 2)
+            # A body saved before is indexed again, not appended.
+            self.save(dogs, "lake-copy.jpg", b"lake body", 3)
+            reader = PackReader(index_path)
+            try:
+                self.assertEqual(reader.read("lake.jpg"), b"lake body")
+                self.assertEqual(reader.read("dog.jpg"), b"dog body")
+                self.assertEqual(reader.read("lake-copy.jpg"), b"lake body")
+            finally:
+                reader.close()
+            self.assertEqual(
+                os.path.getsize(os.path.join(folder, "dogs", "pack-00000.blob")),
+                len(b"dog body"),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
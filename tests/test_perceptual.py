@@ -0,0 +1,99 @@
+"""Unit tests for file_downloader/perceptual.py (needs NumPy and Pillow)."""
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+HAS_DEPENDENCIES = all(
+    importlib.util.find_spec(name) is not None for name in ("numpy", "PIL")
+)
+
+
+def fake_hash(self, data):
+    """The hash is the body itself, so tests pick the distances."""
+    return int.from_bytes(data, "big")
+
+
+@unittest.skipUnless(HAS_DEPENDENCIES, "needs NumPy and Pillow")
+class PerceptualIndexTest(unittest.TestCase):
+    def setUp(self):
+        from perceptual import PerceptualIndex
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.folder.name, "index.sqlite")
+        patcher = mock.patch.object(PerceptualIndex, "hash", fake_hash)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.indexes = []
+
+    def tearDown(self):
+        for index in self.indexes:
+            index.close()
+        self.folder.cleanup()
+
+    def open_index(self, threshold=4):
+        from perceptual import PerceptualIndex
+
+        index = PerceptualIndex(self.index_path, threshold=threshold, processes=1)
+        self.indexes.append(index)
+        return index
+
+    def saved(self, name):
+        path = os.path.join(self.folder.name, name)
+        open(path, "wb").close()
+        return path
+
+    def test_near_duplicates_within_threshold(self):
+        index = self.open_index()
+        first = self.saved("first.jpg")
+        hash_ = 0xF0F0_F0F0_F0F0_F0F0
+        self.assertIsNone(index.check_and_add(hash_.to_bytes(8, "big"), first))
+        near = hash_ ^ 0b1111
+        far = hash_ ^ 0b11111
+        self.assertEqual(index.check_and_add(near.to_bytes(8, "big"), "near"), first)
+        self.assertIsNone(index.check_and_add(far.to_bytes(8, "big"), "far"))
+
+    def test_deleted_matches_are_stale(self):
+        index = self.open_index()
+        first = self.saved("first.jpg")
+        index.check_and_add(b"\x00" * 8, first)
+        os.remove(first)
+        self.assertIsNone(index.check_and_add(b"\x00" * 8, self.saved("second.jpg")))
+
+    def test_other_instances_see_new_rows(self):
+        first, second = self.open_index(), self.open_index()
+        path = self.saved("first.jpg")
+        first.check_and_add(b"\xff" * 8, path)
+        self.assertEqual(second.check_and_add(b"\xff" * 8, "copy"), path)
+
+    def test_growth_past_initial_capacity(self):
+        from perceptual import INITIAL_CAPACITY
+
+        index = self.open_index(threshold=0)
+        path = self.saved("first.jpg")
+        for value in range(INITIAL_CAPACITY + 10):
+            index.check_and_add(value.to_bytes(8, "big"), path)
+        self.assertEqual(index.size, INITIAL_CAPACITY + 10)
+        self.assertEqual(index.find(INITIAL_CAPACITY + 5), path)
+
+    def test_dhash_survives_reencoding(self):
+        from PIL import Image
+
+        from perceptual import dhash
+
+        image = Image.linear_gradient("L").resize((320, 240))
+        original, recompressed = io.BytesIO(), io.BytesIO()
+        image.save(original, format="png")
+        image.resize((160, 120)).save(recompressed, format="jpeg", quality=60)
+        distance = bin(dhash(original.getvalue()) ^ dhash(recompressed.getvalue()))
+        self.assertLessEqual(distance.count("1"), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
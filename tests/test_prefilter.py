@@ -0,0 +1,63 @@
+"""Unit tests for file_downloader/prefilter.py."""
+import os
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from prefilter import PreviewFilter, load_predicate  # noqa: E402
+
+
+def no_fetch(url):
+    raise AssertionError(f"{url} should not be fetched")
+
+
+class PreviewFilterTest(unittest.TestCase):
+    def test_load_predicate(self):
+        self.assertIs(load_predicate("os.path:exists"), os.path.exists)
+        with self.assertRaises(ValueError):
+            load_predicate("os.path")
+
+    def test_size_and_ratio_from_metadata(self):
+        prefilter = PreviewFilter(min_size=(1000, None), aspect_ratio=(1.3, 1.8))
+        files = [
+            {"url": "small", "width": 800, "height": 500},
+            {"url": "square", "width": 2000, "height": 2000},
+            {"url": "wide", "width": 1600, "height": 1000},
+            {"url": "unknown"},
+        ]
+        passed = [file["url"] for file in prefilter.filter(files, no_fetch)]
+        self.assertEqual(passed, ["wide", "unknown"])
+        self.assertEqual((prefilter.candidates, prefilter.passed), (4, 2))
+
+    def test_predicate_gets_preview(self):
+        prefilter = PreviewFilter(workers=2)
+        prefilter.predicate = lambda file, preview: preview == b"keep"
+        files = [
+            {"url": str(i), "preview_url": "keep" if i % 2 else "drop"}
+            for i in range(10)
+        ]
+        passed = prefilter.filter(files, lambda url: url.encode())
+        self.assertEqual(sorted(file["url"] for file in passed), list("13579"))
+        self.assertEqual((prefilter.previews, prefilter.preview_bytes), (10, 40))
+
+    def test_failed_preview_keeps_file(self):
+        prefilter = PreviewFilter()
+        prefilter.predicate = lambda file, preview: False
+
+        def fetch(url):
+            raise OSError("timeout")
+
+        files = [{"url": "a", "preview_url": "a-preview"}]
+        self.assertEqual(list(prefilter.filter(files, fetch)), files)
+
+    def test_raising_predicate_drops_file(self):
+        prefilter = PreviewFilter()
+        prefilter.predicate = lambda file, preview: 1 / 0
+        files = [{"url": "a", "preview_url": "a-preview"}]
+        self.assertEqual(list(prefilter.filter(files, lambda url: b"")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
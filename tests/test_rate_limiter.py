@@ -0,0 +1,104 @@
+"""Unit tests for file_downloader/rate_limiter.py."""
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from rate_limiter import BACKOFF_CAP, RateLimiter, RetryPolicy  # noqa: E402
+
+URL = "https://pixabay.com/api/"
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_unthrottled_without_rate_or_headers(self):
+        limiter = RateLimiter()
+        self.assertEqual([limiter.reserve(URL) for _ in range(1000)], [0.0] * 1000)
+
+    def test_rate_throttles_after_burst(self):
+        limiter = RateLimiter(rate=10, burst=2)
+        self.assertEqual(limiter.reserve(URL), 0.0)
+        self.assertEqual(limiter.reserve(URL), 0.0)
+        self.assertAlmostEqual(limiter.reserve(URL), 0.1, delta=0.01)
+
+    def test_hosts_have_separate_buckets(self):
+        limiter = RateLimiter(rate=10, burst=1)
+        limiter.reserve(URL)
+        self.assertEqual(limiter.reserve("https://api.pexels.com/v1/search"), 0.0)
+
+    def test_pixabay_reset_in_seconds(self):
+        limiter = RateLimiter()
+        limiter.update(
+            URL, 200, {"X-RateLimit-Remaining": "50", "X-RateLimit-Reset": "10"}
+        )
+        self.assertAlmostEqual(limiter.bucket(URL).rate, 5.0)
+
+    def test_pexels_reset_as_timestamp(self):
+        limiter = RateLimiter()
+        reset = time.time() + 20
+        limiter.update(
+            URL,
+            200,
+            {"X-RateLimit-Remaining": "100", "X-RateLimit-Reset": str(reset)},
+        )
+        self.assertAlmostEqual(limiter.bucket(URL).rate, 5.0, delta=0.1)
+
+    def test_exhausted_quota_blocks_until_reset(self):
+        limiter = RateLimiter()
+        limiter.update(
+            URL, 200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "5"}
+        )
+        self.assertAlmostEqual(limiter.reserve(URL), 5.0, delta=0.1)
+
+    def test_retry_after_on_429(self):
+        limiter = RateLimiter()
+        limiter.update(URL, 429, {"Retry-After": "3"})
+        self.assertAlmostEqual(limiter.reserve(URL), 3.0, delta=0.1)
+
+    def test_retry_after_http_date(self):
+        limiter = RateLimiter()
+        retry_after = time.strftime(
+            "%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 60)
+        )
+        limiter.update(URL, 429, {"Retry-After": retry_after})
+        self.assertAlmostEqual(limiter.reserve(URL), 60.0, delta=1.5)
+
+    def test_retry_after_ignored_without_429(self):
+        limiter = RateLimiter()
+        limiter.update(URL, 503, {"Retry-After": "3"})
+        self.assertEqual(limiter.reserve(URL), 0.0)
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_should_retry(self):
+        for status in (429, 500, 502, 503, 504):
+            self.assertTrue(RetryPolicy.should_retry(status))
+        for status in (200, 304, 400, 403, 404):
+            self.assertFalse(RetryPolicy.should_retry(status))
+
+    def test_backoff_is_capped_full_jitter(self):
+        with mock.patch("random.uniform", side_effect=lambda low, high: high):
+            self.assertEqual(RetryPolicy.backoff(0), 0.5)
+            self.assertEqual(RetryPolicy.backoff(3), 4.0)
+            self.assertEqual(RetryPolicy.backoff(20), BACKOFF_CAP)
+        for attempt in range(10):
+            self.assertLessEqual(RetryPolicy.backoff(attempt), BACKOFF_CAP)
+            self.assertGreaterEqual(RetryPolicy.backoff(attempt), 0.0)
+
+    def test_retries_default_and_zero(self):
+        self.assertGreater(RetryPolicy().retries, 0)
+        self.assertEqual(RetryPolicy(retries=0).retries, 0)
+
+    def test_summary_counts(self):
+        policy = RetryPolicy(retries=2)
+        policy.count("retry")
+        policy.count("retry")
+        policy.count("drop")
+        self.assertEqual(policy.summary(), "Retries: 2, dropped after 2 retries: 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
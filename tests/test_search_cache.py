@@ -0,0 +1,74 @@
+"""Unit tests for file_downloader/search_cache.py."""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from search_cache import SearchCache  # noqa: E402
+
+URL = "https://pixabay.com/api/"
+
+
+class SearchCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_key_leaves_out_api_key(self):
+        key = SearchCache.build_key(URL, {"params": {"q": "lake", "key": "a"}})
+        self.assertEqual(
+            key, SearchCache.build_key(URL, {"params": {"q": "lake", "key": "b"}})
+        )
+        self.assertNotEqual(
+            key, SearchCache.build_key(URL, {"params": {"q": "sea", "key": "a"}})
+        )
+
+    def test_survives_between_instances(self):
+        SearchCache(self.path).set("key", {"hits": [1]})
+        self.assertEqual(SearchCache(self.path).get("key"), {"hits": [1]})
+
+    def test_expired_entries_are_misses(self):
+        cache = SearchCache(self.path, ttl=60)
+        with mock.patch("time.time", return_value=1000.0):
+            cache.set("key", {"hits": []})
+        with mock.patch("time.time", return_value=1059.0):
+            self.assertEqual(cache.get("key"), {"hits": []})
+        with mock.patch("time.time", return_value=1061.0):
+            self.assertIsNone(cache.get("key"))
+            self.assertIsNone(SearchCache(self.path, ttl=60).get("key"))
+
+    def test_zero_ttl_is_not_the_default(self):
+        cache = SearchCache(self.path, ttl=0)
+        cache.set("key", {"hits": []})
+        self.assertIsNone(cache.get("key"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = SearchCache(self.path, max_entries=2)
+        for now, key in enumerate("ab"):
+            with mock.patch("time.time", return_value=1000.0 + now):
+                cache.set(key, {"page": key})
+        with mock.patch("time.time", return_value=1002.0):
+            SearchCache(self.path).get("a")
+        with mock.patch("time.time", return_value=1003.0):
+            cache.set("c", {"page": "c"})
+            reopened = SearchCache(self.path)
+            self.assertIsNone(reopened.get("b"))
+            self.assertEqual(reopened.get("a"), {"page": "a"})
+            self.assertEqual(reopened.get("c"), {"page": "c"})
+
+    def test_refresh_writes_but_never_reads(self):
+        cache = SearchCache(self.path, refresh=True)
+        cache.set("key", {"hits": []})
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(SearchCache(self.path).get("key"), {"hits": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""End-to-end runs of file_downloader/sharding.py with --processes."""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader"), os.path.join(ROOT, "benchmarks")]
+
+from stub_server import StubServer  # noqa: E402
+
+
+class ShardedRunTest(unittest.TestCase):
+    def run_cli(self, argv, pixabay, pexels=None):
+        import file_cli_tool
+        from file_downloader import PexelsDownloader, PixabayDownloader
+
+        # Only the parent searches; shards get the image urls in their tasks.
+        with mock.patch.object(
+            PixabayDownloader, "api_url", pixabay.url + "/api/"
+        ), mock.patch.object(
+            PexelsDownloader, "api_url", (pexels or pixabay).url + "/v1/search"
+        ), mock.patch.dict(
+            os.environ, {"API_KEY_PIXABAY": "stub", "API_KEY_PEXELS": "stub"}
+        ):
+            file_cli_tool.main(argv + ["--processes", "2", "--no-cache"])
+
+    def test_query_split_over_processes(self):
+        with tempfile.TemporaryDirectory() as folder, StubServer(
+            latency=0, image_size=1024, total_hits=50
+        ) as server:
+            save_to = os.path.join(folder, "images")
+            argv = ["-q", "lake", "-n", "10", "--source", "pixabay"]
+            self.run_cli(argv + ["--save-to", save_to], server)
+            names = [name for name in os.listdir(save_to) if name.endswith(".jpg")]
+            self.assertEqual(len(names), 10)
+            # The shards shared the dedup index: a second run skips everything.
+            self.run_cli(argv + ["--save-to", save_to], server)
+            names = [name for name in os.listdir(save_to) if name.endswith(".jpg")]
+            self.assertEqual(len(names), 10)
+
+    def test_jobs_split_over_processes(self):
+        with tempfile.TemporaryDirectory() as folder, StubServer(
+            latency=0, image_size=1024, total_hits=50
+        ) as pixabay, StubServer(latency=0, image_size=1024, total_hits=50) as pexels:
+            jobs_path = os.path.join(folder, "jobs.jsonl")
+            with open(jobs_path, "w") as f:
+                for source in ("pixabay", "pexels"):
+                    job = {
+                        "query": "lake",
+                        "n": 4,
+                        "source": source,
+                        "save_to": os.path.join(folder, source),
+                    }
+                    f.write(json.dumps(job) + "\n")
+            index_path = os.path.join(folder, "index.sqlite")
+            self.run_cli(["--jobs", jobs_path, "--index", index_path], pixabay, pexels)
+            for source in ("pixabay", "pexels"):
+                self.assertEqual(len(os.listdir(os.path.join(folder, source))), 4)
+
+if __name__ == "__main__":
+    unittest.main()
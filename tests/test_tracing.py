@@ -0,0 +1,96 @@
+"""Unit tests for file_downloader/tracing.py."""
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from tracing import (NULL_TRACER, JsonlSink, MemorySink, TimedWriter,  # noqa: E402
+                     Tracer, profile, traced)
+
+
+class Searcher:
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    @traced("search")
+    def search(self, query):
+        return query.upper()
+
+
+class TracerTest(unittest.TestCase):
+    def test_span_attributes_and_errors(self):
+        sink = MemorySink()
+        tracer = Tracer(sink)
+        with tracer.span("commit", file_name="a.jpg") as span:
+            span["deduplicated"] = True
+        with self.assertRaises(KeyError):
+            with tracer.span("transfer"):
+                raise KeyError("url")
+        commit, transfer = sink.spans
+        self.assertEqual(commit["name"], "commit")
+        self.assertEqual((commit["file_name"], commit["deduplicated"]), ("a.jpg", True))
+        self.assertEqual(commit["thread"], threading.current_thread().name)
+        self.assertGreaterEqual(commit["duration"], 0)
+        self.assertEqual(transfer["error"], "KeyError")
+
+    def test_iter_span_counts_bytes(self):
+        sink = MemorySink()
+        chunks = Tracer(sink).iter_span("transfer", iter([b"ab", b"cde"]), url="u")
+        self.assertEqual(list(chunks), [b"ab", b"cde"])
+        self.assertEqual(sink.named("transfer")[0]["bytes"], 5)
+
+    def test_disabled_tracer_emits_nothing(self):
+        self.assertFalse(NULL_TRACER.enabled)
+        with NULL_TRACER.span("commit") as span:
+            span["ignored"] = True
+        self.assertEqual(list(NULL_TRACER.iter_span("transfer", iter([b"a"]))), [b"a"])
+
+    def test_traced_method(self):
+        sink = MemorySink()
+        self.assertEqual(Searcher(Tracer(sink)).search("lake"), "LAKE")
+        self.assertEqual(Searcher(None).search("sea"), "SEA")
+        self.assertEqual(len(sink.named("search")), 1)
+
+    def test_jsonl_sink(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "trace.jsonl")
+            tracer = Tracer(JsonlSink(path))
+            tracer.record("ttfb", tracer.origin, 0.25, url="u")
+            tracer.close()
+            with open(path) as f:
+                span = json.loads(f.readline())
+        self.assertEqual(span["name"], "ttfb")
+        self.assertEqual((span["duration"], span["url"]), (0.25, "u"))
+
+    def test_timed_writer(self):
+        f = io.BytesIO()
+        writer = TimedWriter(f)
+        writer.write(b"abc")
+        writer.write(b"de")
+        self.assertEqual((f.getvalue(), writer.bytes), (b"abcde", 5))
+        self.assertIsNotNone(writer.started)
+        self.assertEqual(writer.getvalue(), b"abcde")
+
+    def test_profile_includes_threads(self):
+        def work_in_thread():
+            return sum(range(1000))
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "run.prof")
+            with profile(path):
+                thread = threading.Thread(target=work_in_thread)
+                thread.start()
+                thread.join()
+            functions = {name for _, _, name in pstats.Stats(path).stats}
+        self.assertIn("work_in_thread", functions)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Unit tests for file_downloader/variants.py."""
+import os
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "file_downloader")]
+
+from variants import VariantSelector, build_variants, fit  # noqa: E402
+
+BOXES = [
+    ("small", "s", (640, 640)),
+    ("medium", "m", (1280, 1280)),
+    ("large", "l", (1920, 1920)),
+    ("original", "o", (None, None)),
+]
+
+
+def variants():
+    return build_variants(6000, 4000, 6_000_000, BOXES)
+
+
+class BuildVariantsTest(unittest.TestCase):
+    def test_fit(self):
+        self.assertEqual(fit(6000, 4000, (1920, 1920)), (1920, 1280))
+        self.assertEqual(fit(6000, 4000, (None, 400)), (600, 400))
+        self.assertEqual(fit(600, 400, (1920, None)), (600, 400))
+
+    def test_sizes_scale_with_area(self):
+        built = variants()
+        self.assertEqual([variant.name for variant in built], [box[0] for box in BOXES])
+        self.assertEqual(built[-1].size, 6_000_000)
+        self.assertAlmostEqual(built[1].size, 6_000_000 * 1280 * 853 / (6000 * 4000))
+
+    def test_missing_urls_and_dimensions(self):
+        boxes = BOXES[:1] + [("medium", None, (1280, 1280))]
+        built = build_variants(600, 400, None, boxes)
+        self.assertEqual([variant.name for variant in built], ["small"])
+        self.assertEqual(build_variants(None, 400, None, BOXES), [])
+
+
+class VariantSelectorTest(unittest.TestCase):
+    def select(self, default_url="m", **limits):
+        return VariantSelector(**limits).select(variants(), default_url)
+
+    def test_default_without_limits(self):
+        self.assertEqual(self.select(), "m")
+
+    def test_smallest_variant_filling_max_size(self):
+        self.assertEqual(self.select(max_size=(1600, None)), "l")
+        self.assertEqual(self.select(max_size=(600, 600)), "s")
+        self.assertEqual(self.select(max_size=(8000, None)), "o")
+
+    def test_budget_caps_the_pick(self):
+        self.assertEqual(self.select(max_size=(1600, None), target_bytes=300_000), "m")
+        self.assertEqual(self.select(target_bytes=100_000), "s")
+        self.assertEqual(self.select("l", target_bytes=1), "s")
+        # The default is kept when it is within the budget.
+        self.assertEqual(self.select(target_bytes=10**7), "m")
+
+    def test_unknown_variants_keep_the_default_url(self):
+        self.assertEqual(VariantSelector(max_size=(640, None)).select([], "d"), "d")
+
+    def test_summary_compares_with_defaults(self):
+        selector = VariantSelector(max_size=(600, 600))
+        selector.select(variants(), "l")
+        saved = selector.default_bytes - selector.selected_bytes
+        self.assertAlmostEqual(saved, 614400 - 68320, delta=1)
+        self.assertIn("MB saved", selector.summary())
+
+if __name__ == "__main__":
+    unittest.main()